@@ -1,11 +1,52 @@
 """Reads and writes Line Delimited JSON files in parallel processing."""
 
 from __future__ import print_function
+import os
+import bisect
 import multiprocessing
-import gzip
 import json
 import time
 
+from compression import open_file, get_codec, RangeFile
+import ldindex
+
+
+def dumps_json(tweet):
+    """ Serializes a tweet as a Line Delimited JSON line. """
+    return json.dumps(tweet) + '\n'
+
+
+class Sink(object):
+    """An output file of MultiprocessFiles and how it is written.
+
+    Attributes:
+        path: string
+            path of the file, results are appended to it
+        codec: string
+            codec of the file, by default the output_codec of
+            MultiprocessFiles or the one for the extension of path
+        level: int
+            compression level, by default the compress_level of
+            MultiprocessFiles
+        dumps: function
+            serializes a result as a line, by default the dumps of
+            MultiprocessFiles
+        buffer_size: int
+            size of the writer's buffer for the file, -1 for the default
+        index: bool
+            record the members written in the index of the file (see
+            ldindex)
+    """
+
+    def __init__(self, path, codec=None, level=None, dumps=None,
+                 buffer_size=-1, index=True):
+        self.path = path
+        self.codec = codec
+        self.level = level
+        self.dumps = dumps
+        self.buffer_size = buffer_size
+        self.index = index
+
 
 class MultiprocessFiles:
     """Reads and writes Line Delimited JSON files in parallel processing.
@@ -15,20 +56,63 @@ class MultiprocessFiles:
             number of processors to work on
         queue_size: int
             size of multiprocessing queue
+        batch_size: int
+            number of lines sent through the queues in each message
         workq: multiprocessing queue
             queue to read from
-        writeq: multiprocessing queue
-            queue to write from
+        writeqs: list of multiprocessing queues
+            queues to write from, one per writer
         infile: string
             path to file from where to read tweets
-        outfile: string
-            path to file to write tweets to
+        outfile: string, Sink or dictionary
+            file to write tweets to, or a dictionary mapping sink names to
+            files (paths or Sinks). In the latter case work_func returns
+            (sink name, tweet) pairs and each tweet is routed to its file
+        sinks: dictionary
+            maps sink names to Sinks, the name is None for a single outfile
+        num_writers: int
+            number of writer processes, each writes its share of the sinks
         work_func: function
             function to apply to tweets
+        batch_func: function
+            function to apply to a whole batch of lines instead of
+            work_func, returns a list with a result (or None) for each line
+        finish_func: function
+            called by each worker when it has no more lines, e.g. to report
+            the statistics of its caches. What it returns, if not None, is
+            printed
+        ordered: bool
+            write tweets in the same order as they were read
+        reorder_size: int
+            maximum number of batches in flight when ordered, this bounds
+            the writers' reorder buffers. A writer that falls reorder_size
+            batches behind stops the reader, so an ordered run goes at the
+            pace of its slowest writer
+        compress_level: int
+            compression level used by the workers, low levels suit
+            intermediate files. None uses the codec's default
+        input_codec: string
+            codec of infile, by default chosen by its extension
+        output_codec: string
+            codec of the output files, by default chosen by their extension
+        shard_input: bool
+            let each worker read its own part of infile instead of going
+            through the reader and workq. Only used for uncompressed inputs
+            and compressed inputs with an index (see ldindex), and never
+            when ordered
+        dumps: function
+            serializes a result of work_func as a line, by default as JSON.
+            Sinks can override it
+        counts: dictionary
+            number of lines written to each output, set by run
     """
 
     def __init__(self, infile, outfile, work_func, num_procs=0,
-                 queue_size=2000, verbose=False):
+                 queue_size=2000, batch_size=1000, ordered=False,
+                 reorder_size=0, compress_level=None, input_codec=None,
+                 output_codec=None, shard_input=True, dumps=dumps_json,
+                 num_writers=1, batch_func=None, finish_func=None,
+                 verbose=False):
         if num_procs == 0:
             self.num_procs = multiprocessing.cpu_count()
         else:
@@ -36,83 +120,325 @@ class MultiprocessFiles:
         if verbose:
             print('using %d procs' % (self.num_procs))
         self.queue_size = self.num_procs * queue_size
-        self.workq = multiprocessing.Queue(self.queue_size)
-        self.writeq = multiprocessing.Queue()
+        self.batch_size = max(1, batch_size)
+        # the queues hold batches, keep roughly queue_size lines in flight
+        num_batches = max(2 * self.num_procs,
+                          self.queue_size // self.batch_size)
+        self.workq = multiprocessing.Queue(num_batches)
+        self.countq = multiprocessing.Queue()
         self.infile = infile
         self.outfile = outfile
+        self.routed = isinstance(outfile, dict)
+        if self.routed:
+            outfiles = outfile
+        else:
+            outfiles = {None: outfile}
+        self.sinks = {}
+        for name, sink in outfiles.items():
+            if not isinstance(sink, Sink):
+                sink = Sink(sink)
+            self.sinks[name] = sink
+        self.outfiles = dict((name, sink.path)
+                             for name, sink in self.sinks.items())
         self.work_func = work_func
+        self.batch_func = batch_func
+        self.finish_func = finish_func
+        self.dumps = dumps
+        self.counts = {}
+        self.compress_level = compress_level
+        self.input_codec = input_codec
+        self.shard_input = shard_input
+        self.num_workers = self.num_procs
+        # output members are compressed by the workers, the writers only
+        # append them to the files
+        self.codecs = {}
+        self.levels = {}
+        self.dumpers = {}
+        for name, sink in self.sinks.items():
+            self.codecs[name] = get_codec(sink.path, sink.codec or output_codec)
+            self.levels[name] = sink.level
+            if sink.level is None:
+                self.levels[name] = compress_level
+            self.dumpers[name] = sink.dumps or dumps
+        # each sink is written by one writer
+        self.num_writers = max(1, min(num_writers, len(self.sinks)))
+        self.writer_of = dict((name, i % self.num_writers)
+                              for i, name in enumerate(sorted(self.sinks)))
+        self.writeqs = [multiprocessing.Queue()
+                        for _ in range(self.num_writers)]
+        self.ordered = ordered
+        if reorder_size == 0:
+            reorder_size = 4 * self.num_procs
+        self.reorder_size = reorder_size
+        # the reader takes a slot of every writer for each batch and the
+        # writers give them back once the batch has been written. Every batch
+        # goes to every writer, so the windows are not independent: the
+        # slowest writer throttles the reader and with it the other writers
+        self.windows = [multiprocessing.Semaphore(reorder_size)
+                        for _ in range(self.num_writers)]
+
+    def put_batch(self, seq, batch):
+        """ Adds a batch of lines, tagged with its sequence number, to workq.
+
+        When ordered, waits until every writer has room for the batch in its
+        reorder buffer.
+        """
+        if self.ordered:
+            for window in self.windows:
+                window.acquire()
+        self.workq.put((seq, batch))
 
     def reader(self):
-        """ Reads from file and adds JSON objects to multiprocessing queue. """
-        with gzip.open(self.infile, 'r') as source:
+        """ Reads from file and adds batches of lines to multiprocessing queue.
+        """
+        with open_file(self.infile, 'r', self.input_codec) as source:
             try:
+                seq = 0
+                batch = []
                 for line in source:
-                    # add to queue
-                    self.workq.put(line)
+                    batch.append(line)
+                    if len(batch) == self.batch_size:
+                        # add to queue
+                        self.put_batch(seq, batch)
+                        seq += 1
+                        batch = []
+                if batch:
+                    self.put_batch(seq, batch)
             except IOError as e:
                 print(str(e))
 
         for _ in range(self.num_procs):
             self.workq.put(-1)
 
-    def worker(self):
-        """ Takes JSON object from workq and applies function to it.
-        At the end puts JSON object to writeq.
+    def input_shards(self):
+        """ Splits infile into (start, end) byte ranges, one per worker.
+
+        Uncompressed files are split anywhere, workers align their ranges to
+        lines. Compressed files are split on member boundaries taken from
+        the checkpoints of their index.
+
+        Returns:
+            list of ranges or None if infile can not be split
         """
-        while True:
-            entry = self.workq.get(block=True)
-            if type(entry) == int:
-                if entry < 0:
+        if self.ordered or not self.shard_input:
+            return None
+
+        codec = get_codec(self.infile, self.input_codec)
+        size = os.path.getsize(self.infile)
+        targets = [size * i // self.num_procs for i in range(self.num_procs)]
+        if codec.name == 'plain':
+            starts = targets
+        else:
+            index = ldindex.read_index(self.infile)
+            if index is None or not index['checkpoints']:
+                return None
+            offsets = [checkpoint[0] for checkpoint in index['checkpoints']]
+            # first member starting at or after each target
+            starts = [offsets[min(bisect.bisect_left(offsets, target),
+                                  len(offsets) - 1)]
+                      for target in targets]
+
+        starts = sorted(set(starts))
+        return zip(starts, starts[1:] + [size])
+
+    def read_shard(self, start, end):
+        """ Yields the lines of infile that start in [start, end). """
+        codec = get_codec(self.infile, self.input_codec)
+        with open(self.infile, 'rb') as source:
+            if codec.name != 'plain':
+                # the range holds whole members
+                source.seek(start)
+                for line in codec.reader(RangeFile(source, end - start)):
+                    yield line
+                return
+
+            # skip the line that started in the previous range
+            if start > 0:
+                source.seek(start - 1)
+                source.readline()
+            position = source.tell()
+            while position < end:
+                line = source.readline()
+                if not line:
                     break
+                position += len(line)
+                yield line
 
-            # process line
-            tweet = self.work_func(entry)
-            if tweet is not None:
-                tweet_string = json.dumps(tweet) + '\n'
-                self.writeq.put(tweet_string)
+    def worker(self, shard=None):
+        """ Takes a batch of lines from workq, or from its shard of infile,
+        and applies function to each.
+        """
+        if shard is None:
+            while True:
+                entry = self.workq.get(block=True)
+                if type(entry) == int:
+                    if entry < 0:
+                        break
+                self.process_batch(*entry)
+        else:
+            batch = []
+            for line in self.read_shard(*shard):
+                batch.append(line)
+                if len(batch) == self.batch_size:
+                    self.process_batch(0, batch)
+                    batch = []
+            if batch:
+                self.process_batch(0, batch)
+
+        if self.finish_func is not None:
+            report = self.finish_func()
+            if report is not None:
+                print('worker %d: %s' % (os.getpid(), report))
 
         # exit
-        self.writeq.put(-1)
+        for writeq in self.writeqs:
+            writeq.put(-1)
+
+    def process_batch(self, seq, lines):
+        """ Applies function to each line, or batch_func to all of them. At
+        the end compresses the serialized results of the batch into one
+        member per sink and puts them to the queue of the sink's writer.
+        """
+        results = {}
+        if self.batch_func is not None:
+            tweets = self.batch_func(lines)
+        else:
+            tweets = [self.work_func(line) for line in lines]
+        for tweet in tweets:
+            if tweet is None:
+                continue
+            if self.routed:
+                name, tweet = tweet
+            else:
+                name = None
+            results.setdefault(name, []).append(self.dumpers[name](tweet))
+        shares = [{} for _ in self.writeqs]
+        for name, tweets in results.items():
+            data = ''.join(tweets)
+            member = self.codecs[name].compress(data, self.levels[name])
+            shares[self.writer_of[name]][name] = (len(tweets), len(data),
+                                                  member)
+        # empty batches are still sent so the ordered writers can move on
+        for writeq, share in zip(self.writeqs, shares):
+            if share or self.ordered:
+                writeq.put((seq, share))
 
-    def writer(self):
-        """ Takes JSON object from queue and writes it to outfile. """
+    def writer(self, shard=0):
+        """ Takes compressed batches from the queue of writer shard and
+        appends them to its sinks. At the end puts the number of lines
+        written to each sink to countq.
+
+        When ordered, batches that arrive early are held until every batch
+        before them has been written. Every member is recorded as a
+        checkpoint in the index of its file (see ldindex).
+        """
         start_time = time.time()
         counter = 0
-        with gzip.open(self.outfile, 'a') as destination:
-            while True:
-                tweet = self.writeq.get(block=True)
-                if type(tweet) == int:
-                    if tweet == - 1:
-                        self.num_procs = self.num_procs - 1
-                        if self.num_procs == 0:
-                            break
-                else:
-                    destination.write(tweet)
-                    destination.flush()
-                    counter += 1
-                    if counter % (4 * self.queue_size) == 0:
-                        end_time = time.time()
-                        processed_per_second = (counter / (end_time -
-                                                start_time)) / 1000
-                        print('total processed lines = %dk lines/s = %dk' 
-                               % (int(counter / 1000), 
-                                  int(processed_per_second)))
+        report_every = 4 * self.queue_size
+        next_report = report_every
+        next_seq = 0
+        pending = {}
+        num_workers = self.num_workers
+        writeq = self.writeqs[shard]
+        destinations = {}
+        indexes = {}
+        counts = {}
+        for name, sink in self.sinks.items():
+            if self.writer_of[name] != shard:
+                continue
+            counts[name] = 0
+            indexes[name] = None
+            if sink.index:
+                indexes[name] = ldindex.new_index()
+                if os.path.exists(sink.path) and \
+                        os.path.getsize(sink.path) > 0:
+                    # appending, the index is only kept if it is up to date
+                    indexes[name] = ldindex.read_index(sink.path)
+            destinations[name] = open(sink.path, 'ab', sink.buffer_size)
+        while True:
+            entry = writeq.get(block=True)
+            if type(entry) == int:
+                if entry == - 1:
+                    num_workers = num_workers - 1
+                    if num_workers == 0:
+                        break
+                continue
+
+            if self.ordered:
+                seq, results = entry
+                pending[seq] = results
+                batches = []
+                while next_seq in pending:
+                    batches.append(pending.pop(next_seq))
+                    next_seq += 1
+            else:
+                batches = [entry[1]]
+
+            for results in batches:
+                for name, (num_tweets, size, member) in results.items():
+                    destinations[name].write(member)
+                    index = indexes[name]
+                    if index is not None:
+                        index['checkpoints'].append([index['size'],
+                                                     index['usize'],
+                                                     index['lines']])
+                        index['size'] += len(member)
+                        index['usize'] += size
+                        index['lines'] += num_tweets
+                    counts[name] += num_tweets
+                    counter += num_tweets
+                if self.ordered:
+                    self.windows[shard].release()
+
+            if counter >= next_report:
+                next_report = (counter // report_every + 1) * report_every
+                end_time = time.time()
+                processed_per_second = (counter / (end_time -
+                                        start_time)) / 1000
+                print('total processed lines = %dk lines/s = %dk' 
+                       % (int(counter / 1000), 
+                          int(processed_per_second)))
+
+        for name, destination in destinations.items():
+            destination.close()
+            if indexes[name] is not None:
+                ldindex.write_index(self.outfiles[name], indexes[name])
+        self.countq.put(counts)
 
     def run(self):
-        """ Runs reader, num_procs workers and writer. """
+        """ Runs reader, num_procs workers and num_writers writers.
+
+        If infile can be split each worker reads its own shard and the reader
+        is not needed.
+
+        Returns:
+            dictionary with the number of lines written to each sink (the
+            key is None for a single outfile)
+        """
+        shards = self.input_shards()
+
         # start procs
         procs = []
-        proc = multiprocessing.Process(target=self.reader)
-        proc.start()
-        procs.append(proc)
+        if shards is None:
+            proc = multiprocessing.Process(target=self.reader)
+            proc.start()
+            procs.append(proc)
+            shards = [None] * self.num_procs
+        self.num_workers = len(shards)
 
-        for _ in xrange(self.num_procs):
-            proc = multiprocessing.Process(target=self.worker)
+        for shard in shards:
+            proc = multiprocessing.Process(target=self.worker, args=(shard,))
             proc.start()
             procs.append(proc)
 
-        proc = multiprocessing.Process(target=self.writer)
-        proc.start()
-        procs.append(proc)
+        for shard in range(self.num_writers):
+            proc = multiprocessing.Process(target=self.writer, args=(shard,))
+            proc.start()
+            procs.append(proc)
         # wait for processes to finish
         [proc.join() for proc in procs]
+        # the writers have exited, their counts are already in the queue
+        self.counts = {}
+        while not self.countq.empty():
+            self.counts.update(self.countq.get())
+        return self.counts
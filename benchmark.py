@@ -0,0 +1,436 @@
+"""
+Benchmarks of the per-tweet hot spots against their previous implementations.
+
+Each subcommand reads a Line Delimited JSON corpus (e.g. the
+tweets.<lang>.final.json.gz written by sentiment_gen), checks that the current
+code gives the same results as the reference implementation kept here and
+prints the cost per tweet of both:
+
+    python benchmark.py smileys generated_tweets_en/tweets.en.final.json.gz
+
+Subcommands that take an optional corpus generate synthetic tweets without
+one.
+"""
+
+from __future__ import print_function
+import os
+import re
+import json
+import random
+import argparse
+import itertools
+import timeit
+import subprocess
+import sys
+import tempfile
+
+from compression import open_file
+import filter_emoticons
+import preprocess
+import twokenize
+import gen_emoji_tables
+from tokenize import MemoizedTokenizer, word_tokenize
+from lrucache import LRUCache
+
+EMOJI_DATA = os.path.join(gen_emoji_tables.HERE, 'emoji-data.txt')
+
+
+def legacy_process_line(prob_smiley, json_line, seed=None):
+    """ filter_emoticons.process_line with the smileys searched in lists """
+    tweet = json.loads(json_line)
+    unicode_line = tweet['text'].strip()
+    tokens = unicode_line.split()
+    pos_smileys = filter_emoticons.pos_smileys
+    neg_smileys = filter_emoticons.neg_smileys
+
+    has_pos = False
+    has_neg = False
+    for sm in pos_smileys:
+        if sm in tokens:
+            has_pos = True
+            break
+    for sm in neg_smileys:
+        if sm in tokens:
+            has_neg = True
+            break
+
+    if not has_neg and not has_pos:
+        return (None, unicode_line)
+    if has_pos and has_neg:
+        return (None, unicode_line)
+
+    coin = filter_emoticons.record_random(seed, tweet.get('id'))
+    remove_smiley = coin > prob_smiley
+    if has_pos:
+        if remove_smiley:
+            tokens = [x for x in tokens if x not in pos_smileys]
+        return (filter_emoticons.POS, u' '.join(tokens))
+    if has_neg:
+        if remove_smiley:
+            tokens = [x for x in tokens if x not in neg_smileys]
+        return (filter_emoticons.NEG, u' '.join(tokens))
+    return None
+
+
+def legacy_update_indices(list_of_indices, delta, start_index):
+    """ Updates indices in list by delta """
+    if list_of_indices is None:
+        return
+
+    for element in list_of_indices:
+        if element[0] < start_index:
+            continue
+        element[0] += delta
+        element[1] += delta
+
+
+def legacy_replace_entity(entity, tweet, indices_list, other_lists,
+                          replacements):
+    """ Replaces entity in tweet one index at a time, updating the indices
+    of every list after each replacement
+    """
+    for index_list in indices_list:
+        if index_list[1] > 140:
+            return None
+        entity_length = index_list[1] - index_list[0]
+        replacement_word_length = len(replacements[entity])
+        tweet['text'] = (tweet['text'][:index_list[0]] + replacements[entity] +
+                         tweet['text'][index_list[1]:])
+        delta = replacement_word_length - entity_length
+        for other_list in other_lists:
+            legacy_update_indices(other_list, delta, index_list[0])
+        legacy_update_indices(indices_list, delta, index_list[0])
+
+    return True
+
+
+def legacy_replace_entities(tweet, replacements):
+    """ preprocess.replace_entities rebuilding the text for every entity """
+    if 'entities' not in tweet:
+        return tweet
+
+    fields = [field for field, _ in preprocess.ENTITIES]
+    lists = {}
+    for field in fields:
+        lists[field] = None
+        if field in tweet['entities']:
+            lists[field] = [item['indices'] for item in
+                            tweet['entities'][field]]
+
+    for field, entity in preprocess.ENTITIES:
+        if lists[field] is None or replacements[entity] is None:
+            continue
+        other_lists = [lists[other] for other in fields if other != field]
+        if not legacy_replace_entity(entity, tweet, lists[field],
+                                     other_lists, replacements):
+            return None
+
+    ntweet = {u'text': tweet['text'], u'lang': tweet['lang'],
+              u'id': tweet['id']}
+    if 'created_at' in tweet:
+        ntweet['created_at'] = tweet['created_at']
+    if 'retweet_id' in tweet:
+        ntweet['retweet_id'] = tweet['retweet_id']
+
+    return ntweet
+
+
+def entity_tweets(n, rng):
+    """ Returns n LD-JSON tweets with many entities, some of them past
+    character 140 and a few overlapping
+    """
+    fields = [field for field, _ in preprocess.ENTITIES]
+    lines = []
+    for i in range(n):
+        words = []
+        entities = dict((field, []) for field in fields)
+        position = 0
+        for _ in range(rng.randint(5, 30)):
+            word = u'w' * rng.randint(1, 12)
+            if rng.random() < 0.5:
+                field = rng.choice(fields)
+                word = u'@#$h'[fields.index(field) % 4] + word
+                indices = [position, position + len(word)]
+                entities[field].append({'indices': indices})
+                if rng.random() < 0.02:
+                    # e.g. the same link as url and media
+                    entities[rng.choice(fields)].append(
+                        {'indices': list(indices)})
+            words.append(word)
+            position += len(word) + 1
+        for field in fields:
+            rng.shuffle(entities[field])
+        tweet = {'id': i, 'lang': 'en', 'text': u' '.join(words),
+                 'entities': entities}
+        lines.append(json.dumps(tweet) + '\n')
+    return lines
+
+
+def legacy_emoji_re():
+    """ twokenize.re_emoji as an alternation of every emoji in
+    emoji-data.txt, singles first
+    """
+    singles, pairs = gen_emoji_tables.read_emoji_data(EMOJI_DATA)
+    all_emoji = ([unichr(x) for x in singles] +
+                 [unichr(x) + unichr(y) for x, y in pairs])
+    all_emoji = [re.escape(x) for x in all_emoji]
+    return re.compile(u'(' + u'|'.join(all_emoji) + u')', re.UNICODE)
+
+
+def emoji_tokens(rng):
+    """ Returns tokens with every emoji alone, repeated, glued to words and
+    to each other, and with the halves of every pair on their own
+    """
+    emoji = twokenize.all_emoji_1 + twokenize.all_emoji_2
+    halves = [x for pair in twokenize.all_emoji_2 for x in pair]
+    tokens = []
+    for x in emoji + halves:
+        tokens.extend([x, x + x, u'a' + x + u'b', x + u':)' + x])
+        tokens.append(x + rng.choice(emoji) + rng.choice(halves))
+    for _ in range(len(emoji)):
+        tokens.append(u''.join(rng.choice(emoji + halves + [u'w', u'#', u'1'])
+                               for _ in range(rng.randint(1, 6))))
+    return tokens
+
+
+def repeated_texts(n, duplicates, rng):
+    """ Returns n tweet texts, a fraction duplicates of which repeat an
+    earlier one. Like retweets, the repeated texts are mostly recent ones.
+    """
+    words = [u'hello', u'world', u"don't", u"l'amore", u'@user', u'#tag',
+             u'http://t.co/x', u'(yes)', u':)', u':-(', u'...', u'2015',
+             u'\u2764', u'\U0001f602', u'coffee', u'rain', u'!!!']
+    texts = []
+    for _ in range(n):
+        if texts and rng.random() < duplicates:
+            back = min(len(texts) - 1, int(rng.expovariate(1.0 / 2000)))
+            texts.append(texts[-1 - back])
+        else:
+            texts.append(u' '.join(rng.choice(words)
+                                   for _ in range(rng.randint(5, 25))))
+    return texts
+
+
+def read_corpus(path, limit):
+    """ Returns up to limit lines of path, all of them if limit is 0 """
+    with open_file(path, 'r') as source:
+        if limit:
+            return list(itertools.islice(source, limit))
+        return list(source)
+
+
+def per_item(func, items, repeat, prepare=None):
+    """ Best time in microseconds of func on each of items over repeat runs,
+    prepare(items) makes fresh arguments for each run outside of the timing
+    """
+    best = None
+    for _ in range(repeat):
+        args = items if prepare is None else prepare(items)
+        start = timeit.default_timer()
+        for arg in args:
+            func(arg)
+        elapsed = timeit.default_timer() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best * 1e6 / max(1, len(items))
+
+
+def report(name, items, reference, current, repeat, prepare=None):
+    """ Checks that reference and current agree on items and prints their
+    cost per item.
+
+    Returns: number of items on which they disagree
+    """
+    if prepare is None:
+        prepare = list
+    mismatches = sum(1 for before, after in zip(prepare(items),
+                                                prepare(items))
+                     if reference(before) != current(after))
+    before = per_item(reference, items, repeat, prepare)
+    after = per_item(current, items, repeat, prepare)
+    print('%s: %d items, %d mismatches' % (name, len(items), mismatches))
+    print('    reference %.2f us/item, current %.2f us/item, %.1fx'
+          % (before, after, before / after if after else 0))
+    return mismatches
+
+
+def bench_smileys(args):
+    """ Smiley detection and removal in filter_emoticons.process_line """
+    lines = read_corpus(args.corpus, args.limit)
+    lines = [line for line in lines if 'text' in json.loads(line)]
+
+    def reference(line):
+        return legacy_process_line(args.prob_smiley, line, 0)
+
+    def current(line):
+        return filter_emoticons.process_line(args.prob_smiley, line, 0)
+
+    return report('smileys', lines, reference, current, args.repeat)
+
+
+def bench_entities(args):
+    """ Entity replacement in preprocess.replace_entities """
+    if args.corpus:
+        lines = read_corpus(args.corpus, args.limit)
+    else:
+        lines = entity_tweets(args.limit or 100000, random.Random(args.seed))
+    replacements = json.load(open('replacements.json'))
+
+    def parse(items):
+        # both implementations may change the tweet they get
+        return [json.loads(item) for item in items]
+
+    def reference(tweet):
+        return legacy_replace_entities(tweet, replacements)
+
+    def current(tweet):
+        return preprocess.replace_entities(tweet, replacements)
+
+    return report('entities', lines, reference, current, args.repeat, parse)
+
+
+def bench_emoji(args):
+    """ Splitting tokens on emoji with twokenize.re_emoji """
+    tokens = emoji_tokens(random.Random(args.seed))
+    if args.corpus:
+        for line in read_corpus(args.corpus, args.limit):
+            tokens.extend(json.loads(line)['text'].split())
+    legacy = legacy_emoji_re()
+
+    def reference(token):
+        return legacy.split(token)
+
+    def current(token):
+        return twokenize.re_emoji.split(token)
+
+    print('regex: %d characters, was %d' % (len(twokenize.re_emoji.pattern),
+                                            len(legacy.pattern)))
+    return report('emoji', tokens, reference, current, args.repeat)
+
+
+def bench_tokenize(args):
+    """ Tokenization with and without a cache of the tokens of recent texts """
+    if args.corpus:
+        texts = [json.loads(line)['text']
+                 for line in read_corpus(args.corpus, args.limit)]
+    else:
+        texts = repeated_texts(args.limit or 100000, args.duplicates,
+                               random.Random(args.seed))
+    tokenize = {'tokenize': twokenize.tokenize,
+                'tokenize2': twokenize.tokenize2,
+                'word_tokenize': word_tokenize}[args.tokenizer]
+    memoized = MemoizedTokenizer(tokenize, args.cache_size)
+
+    def empty_cache(items):
+        # every run starts with an empty cache
+        memoized.cache = LRUCache(args.cache_size)
+        return items
+
+    print('%d texts, %d distinct' % (len(texts), len(set(texts))))
+    mismatches = report('tokenize', texts, tokenize, memoized, args.repeat,
+                        empty_cache)
+    print('    cache: %s' % memoized.cache.stats())
+    return mismatches
+
+
+def best_time(func, repeat):
+    """ Best time in seconds of func over repeat runs """
+    return min(timeit.timeit(func, number=1) for _ in range(repeat))
+
+
+def import_time(module, repeat):
+    """ Best time in seconds to import module in a fresh interpreter """
+    statement = 'import timeit, sys; start = timeit.default_timer(); ' \
+                'import %s; sys.stdout.write(repr(timeit.default_timer() ' \
+                '- start))' % module
+    return min(float(subprocess.check_output(
+        [sys.executable, '-c', statement], cwd=gen_emoji_tables.HERE))
+               for _ in range(repeat))
+
+
+def bench_startup(args):
+    """ Worker startup: importing the tokenizer and loading langid's model """
+    import classify_langid
+    import langid.langid
+
+    def legacy_emoji():
+        # what importing twokenize did
+        re.purge()
+        legacy_emoji_re().split(u'')
+
+    def current_emoji():
+        re.purge()
+        re.compile(twokenize.EMOJI_PATTERN, re.UNICODE).split(u'')
+
+    def cold_model():
+        langid.langid.LanguageIdentifier.from_modelstring(langid.langid.model)
+
+    cache_path = os.path.join(tempfile.mkdtemp(), 'langid-model.cache')
+
+    def warm_model():
+        classify_langid._model = None
+        classify_langid.load_model(cache_path)
+
+    # writes the cache the warm loads read
+    warm_model()
+    for name, before, after in [
+            ('emoji regex', legacy_emoji, current_emoji),
+            ('langid model', cold_model, warm_model)]:
+        before = best_time(before, args.repeat)
+        after = best_time(after, args.repeat)
+        print('%s: reference %.3f s, current %.3f s, %.1fx'
+              % (name, before, after, before / after if after else 0))
+    os.remove(cache_path)
+    os.rmdir(os.path.dirname(cache_path))
+
+    for module in ['twokenize', 'classify_langid']:
+        print('import %s: %.3f s' % (module, import_time(module, args.repeat)))
+
+
+def main():
+    """ main """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--limit', type=int, default=100000,
+                        help='tweets read from the corpus, 0 for all')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='runs of each implementation, the best counts')
+    subparsers = parser.add_subparsers()
+
+    smileys = subparsers.add_parser('smileys', help=bench_smileys.__doc__)
+    smileys.add_argument('corpus', help='LD-JSON tweets')
+    smileys.add_argument('-m', '--prob_smiley', type=float, default=0.4)
+    smileys.set_defaults(func=bench_smileys)
+
+    entities = subparsers.add_parser('entities', help=bench_entities.__doc__)
+    entities.add_argument('corpus', nargs='?',
+                          help='LD-JSON tweets with entities')
+    entities.add_argument('-s', '--seed', type=int, default=1)
+    entities.set_defaults(func=bench_entities)
+
+    emoji = subparsers.add_parser('emoji', help=bench_emoji.__doc__)
+    emoji.add_argument('corpus', nargs='?',
+                       help='LD-JSON tweets whose tokens are added to the \
+                             conformance tokens')
+    emoji.add_argument('-s', '--seed', type=int, default=1)
+    emoji.set_defaults(func=bench_emoji)
+
+    tokenize = subparsers.add_parser('tokenize', help=bench_tokenize.__doc__)
+    tokenize.add_argument('corpus', nargs='?',
+                          help='LD-JSON tweets, not deduplicated')
+    tokenize.add_argument('-d', '--duplicates', type=float, default=0.3,
+                          help='fraction of repeated synthetic texts')
+    tokenize.add_argument('-c', '--cache_size', type=int, default=10000)
+    tokenize.add_argument('-t', '--tokenizer', default='tokenize2',
+                          choices=['tokenize', 'tokenize2', 'word_tokenize'])
+    tokenize.add_argument('-s', '--seed', type=int, default=1)
+    tokenize.set_defaults(func=bench_tokenize)
+
+    startup = subparsers.add_parser('startup', help=bench_startup.__doc__)
+    startup.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,20 +4,270 @@ Reads a Line Delimited JSON file containing tweets.
 Tweets in file should be preprocessed.
 Outputs only those with the selected language probability higher than
 'langid_min_prob'.
+
+BatchLanguageIdentifier scores a whole batch of texts with numpy and gives the
+same results as langid.classify. filter_classify_lang_batch uses it and is
+registered as the batch version of filter_classify_lang_line (see pipeline).
+
+By default the scores are langid's raw ones over all its languages. The
+stage can instead restrict langid to the target language and a few
+candidates (e.g. the languages it is confused with), normalize the scores
+into probabilities and cache the results of repeated texts.
 """
 
 from __future__ import print_function
+import os
 import json
 import argparse
 import sys
+import hashlib
+import cPickle
 from functools import partial
 
-import langid
+import numpy as np
+import langid.langid
 
 from MultiprocessFiles import MultiprocessFiles
+from lrucache import LRUCache
+from pipeline import load_tweet, analyze_tweet, register_batch_stage, \
+    apply_stages_batch
+
+
+class BatchLanguageIdentifier(object):
+    """Classifies batches of texts with the model of a langid
+    LanguageIdentifier.
+
+    langid runs the bytes of a text through a automaton, counts the features
+    it outputs and takes the dot product of the counts with the model. Here
+    the automaton runs over all the texts of a batch at once and the scores
+    are sums of the model rows of the features found, so no dense feature
+    vector is built.
+
+    Attributes:
+        identifier: langid.langid.LanguageIdentifier
+            identifier whose model and language set are used
+        nextmove: numpy array
+            next state of the automaton, indexed by (state << 8) + byte
+        output_start: numpy array
+            where the features of each state start in output_features
+        output_features: numpy array
+            features output by the states, state after state
+        max_rows: int
+            maximum number of model rows gathered at once, bounds memory
+    """
+
+    def __init__(self, identifier=None, max_rows=65536):
+        if identifier is None:
+            if langid.langid.identifier is None:
+                langid.langid.load_model()
+            identifier = langid.langid.identifier
+        self.identifier = identifier
+        self.max_rows = max_rows
+        self.nextmove = np.array(identifier.tk_nextmove, dtype=np.int64)
+        num_states = len(self.nextmove) >> 8
+        lengths = np.zeros(num_states, dtype=np.int64)
+        for state, features in identifier.tk_output.items():
+            lengths[state] = len(features)
+        self.output_start = np.zeros(num_states + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.output_start[1:])
+        self.output_features = np.zeros(self.output_start[-1],
+                                        dtype=np.int64)
+        for state, features in identifier.tk_output.items():
+            start = self.output_start[state]
+            self.output_features[start:start + len(features)] = features
+
+    def states(self, texts):
+        """Runs the automaton over texts.
+
+        Returns:
+            (text index, state) arrays with an entry for every byte of every
+            text
+        """
+        data = [text.encode('utf8') if isinstance(text, unicode) else text
+                for text in texts]
+        lengths = np.array([len(x) for x in data], dtype=np.int64)
+        width = lengths.max() if len(data) else 0
+        inside = np.arange(width)[None, :] < lengths[:, None]
+        padded = np.zeros((len(data), width), dtype=np.int64)
+        padded[inside] = np.frombuffer(''.join(data), dtype=np.uint8)
+
+        state = np.zeros(len(data), dtype=np.int64)
+        visited = np.zeros((len(data), width), dtype=np.int64)
+        for i in range(width):
+            state = self.nextmove[(state << 8) + padded[:, i]]
+            visited[:, i] = state
+
+        text_index = np.repeat(np.arange(len(data)), lengths)
+        return text_index, visited[inside]
+
+    def scores(self, texts):
+        """Returns the log-probability of each text in each language of the
+        identifier, a (number of texts, number of languages) array.
+        """
+        nb_ptc = self.identifier.nb_ptc
+        scores = np.zeros((len(texts), nb_ptc.shape[1]))
+        if not len(texts):
+            return scores
+
+        # times each text enters each state
+        text_index, state = self.states(texts)
+        num_states = len(self.output_start) - 1
+        keys, counts = np.unique(text_index * num_states + state,
+                                 return_counts=True)
+        text_index = keys // num_states
+        state = keys % num_states
 
+        # one row for every feature output by those states
+        lengths = (self.output_start[state + 1] -
+                   self.output_start[state])
+        rows = lengths.sum()
+        ends = np.cumsum(lengths)
+        offset = np.arange(rows) - np.repeat(ends - lengths, lengths)
+        features = self.output_features[
+            np.repeat(self.output_start[state], lengths) + offset]
+        text_index = np.repeat(text_index, lengths)
+        counts = np.repeat(counts, lengths)
+
+        # rows are sorted by text, sum the model rows of each text
+        for start in range(0, rows, self.max_rows):
+            end = min(start + self.max_rows, rows)
+            chunk_texts = text_index[start:end]
+            first = np.flatnonzero(np.r_[True, chunk_texts[1:] !=
+                                         chunk_texts[:-1]])
+            weighted = nb_ptc[features[start:end]] * \
+                counts[start:end, None]
+            scores[chunk_texts[first]] += np.add.reduceat(weighted, first)
+
+        return scores + self.identifier.nb_pc
+
+    def classify(self, texts):
+        """Returns the (language, confidence) of each of texts, the same as
+        the identifier's classify.
+        """
+        results = []
+        for probs in self.scores(texts):
+            probs = self.identifier.norm_probs(probs)
+            cl = np.argmax(probs)
+            results.append((str(self.identifier.nb_classes[cl]),
+                            float(probs[cl])))
+        return results
+
+
+# decoded langid model, kept next to this file. Decoding the model shipped
+# with langid takes seconds and was paid by every worker process
+MODEL_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'langid-model.cache')
+_model = None
+
+
+def load_model(cache_path=MODEL_CACHE):
+    """Returns the arguments of langid.langid.LanguageIdentifier for langid's
+    model, except norm_probs.
+
+    The decoded model is read from cache_path if it was written for the same
+    langid model, otherwise it is decoded and written there. A cache that
+    cannot be read or written is ignored.
+    """
+    global _model
+    if _model is not None:
+        return _model
+
+    digest = hashlib.md5(langid.langid.model).hexdigest()
+    try:
+        with open(cache_path, 'rb') as cache:
+            cached_digest, model = cPickle.load(cache)
+        if cached_digest == digest:
+            _model = model
+            return _model
+    except:
+        pass
+
+    identifier = langid.langid.LanguageIdentifier.from_modelstring(
+        langid.langid.model)
+    _model = (identifier.nb_ptc, identifier.nb_pc, identifier.nb_numfeats,
+              identifier.nb_classes, identifier.tk_nextmove,
+              identifier.tk_output)
+    try:
+        # written aside and renamed so that workers never read half a file
+        partial_path = '%s.%d' % (cache_path, os.getpid())
+        with open(partial_path, 'wb') as cache:
+            cPickle.dump((digest, _model), cache, 2)
+        os.rename(partial_path, cache_path)
+    except (IOError, OSError):
+        pass
+    return _model
 
-def filter_classify_lang_line(lang, langid_min_prob, replacements, line):
+
+class LanguageClassifier(object):
+    """Classifies texts with its own langid identifier and a cache.
+
+    Attributes:
+        batch: BatchLanguageIdentifier
+            classifier of the texts that are not cached
+        cache: LRUCache
+            (language, confidence) of recent texts, None without a cache
+    """
+
+    def __init__(self, languages=None, normalize=False, cache_size=0):
+        identifier = langid.langid.LanguageIdentifier(
+            *load_model(), norm_probs=normalize)
+        if languages:
+            identifier.set_languages(languages)
+        self.batch = BatchLanguageIdentifier(identifier)
+        self.cache = None
+        if cache_size > 0:
+            self.cache = LRUCache(cache_size)
+
+    def classify(self, texts):
+        """Returns the (language, confidence) of each of texts."""
+        if self.cache is None:
+            return self.batch.classify(texts)
+
+        results = [self.cache.get(text) for text in texts]
+        # texts repeated in the batch are classified once
+        missing = list(set(text for text, result in zip(texts, results)
+                           if result is None))
+        if not missing:
+            return results
+        found = dict(zip(missing, self.batch.classify(missing)))
+        for text, result in found.items():
+            self.cache.put(text, result)
+        return [result if result is not None else found[text]
+                for text, result in zip(texts, results)]
+
+
+# one classifier per configuration, built when first needed, workers forked
+# after that share it
+_classifiers = {}
+
+
+def get_classifier(lang, candidates=None, normalize=False, cache_size=0):
+    """Returns the LanguageClassifier for lang.
+
+    Args:
+        lang: string
+            target language
+        candidates: list
+            languages langid chooses from besides lang, all of them if None
+        normalize: bool
+            confidences are probabilities over the languages, instead of
+            langid's raw scores
+        cache_size: int
+            number of texts whose results are cached
+    """
+    languages = None
+    if candidates:
+        languages = tuple(sorted(set(candidates) | set([lang])))
+    key = (languages, normalize, cache_size)
+    if key not in _classifiers:
+        _classifiers[key] = LanguageClassifier(languages, normalize,
+                                               cache_size)
+    return _classifiers[key]
+
+
+def filter_classify_lang_line(lang, langid_min_prob, replacements, line,
+                              candidates=None, normalize=False,
+                              cache_size=0):
     """ With langid calculates probability of text being in which language.
 
     Args:
@@ -25,31 +275,31 @@ def filter_classify_lang_line(lang, langid_min_prob, replacements, line):
             represents one tweet
         replacements: dictionary
             entities to be replaced
+        candidates, normalize, cache_size:
+            configure the classifier, see get_classifier
 
     Returns:
         only tweets with the selected language probability higher than
         langid_min_prob.
     """
     try:
-        tweet = json.loads(line)
+        tweet = load_tweet(line)
     except:
         return None
 
     if tweet is None:
         return None
 
-    tokens = tweet['text'].split()
-    list_replacements = replacements.values()
-    tokens = [x for x in tokens if x not in list_replacements and
-              x.isalpha() and x.lower() != u'rt']
-
-    if not tokens:
+    # attached by preprocess_tweet when the stages are chained
+    tweet, analysis = analyze_tweet(tweet, replacements)
+    if not analysis.tokens:
         return None
 
-    text = u' '.join(tokens)
+    text = analysis.joined
 
     # Check if identified language is the expected language
-    lid, prob = langid.classify(text)  # text without properties
+    classifier = get_classifier(lang, candidates, normalize, cache_size)
+    lid, prob = classifier.classify([text])[0]  # text without properties
     if lid != lang:
         return None
 
@@ -60,6 +310,46 @@ def filter_classify_lang_line(lang, langid_min_prob, replacements, line):
     return tweet
 
 
+def filter_classify_lang_batch(lang, langid_min_prob, replacements, lines,
+                               candidates=None, normalize=False,
+                               cache_size=0):
+    """ filter_classify_lang_line for a list of tweets, classified together.
+
+    Returns:
+        list with the tweet or None for each of lines
+    """
+    results = [None] * len(lines)
+    texts = []
+    positions = []
+    for i, line in enumerate(lines):
+        try:
+            tweet = load_tweet(line)
+        except:
+            continue
+        if tweet is None:
+            continue
+
+        tweet, analysis = analyze_tweet(tweet, replacements)
+        if not analysis.tokens:
+            continue
+        results[i] = tweet
+        texts.append(analysis.joined)
+        positions.append(i)
+
+    classifier = get_classifier(lang, candidates, normalize, cache_size)
+    languages = classifier.classify(texts)
+    for i, (lid, prob) in zip(positions, languages):
+        # Check if identified language is the expected language and
+        # filter based on langid minimum probability
+        if lid != lang or prob < langid_min_prob:
+            results[i] = None
+
+    return results
+
+
+register_batch_stage(filter_classify_lang_line, filter_classify_lang_batch)
+
+
 def main():
     """ main """
     lang_codes = ['en']
@@ -74,6 +364,14 @@ def main():
     parser.add_argument('-p', '---langid_min_prob', type=float,
                         help='outputs only tweets that have langid_min_prob \
                               or higher probability')
+    parser.add_argument('-c', '--candidates',
+                        help='languages langid chooses from besides the \
+                              target, comma seperated. Default: all')
+    parser.add_argument('--normalize', action='store_true', default=False,
+                        help='langid_min_prob is a probability over the \
+                              candidates instead of a raw langid score')
+    parser.add_argument('--cache_size', type=int, default=0,
+                        help='number of texts whose language is cached')
     parser.add_argument('-n', '--num_jobs', type=int, default=0,
                         help='number of worker processes to use. Default: \
                               number of cores')
@@ -97,12 +395,21 @@ def main():
     if args.langid_min_prob:
         langid_min_prob = args.langid_min_prob
 
+    candidates = None
+    if args.candidates:
+        candidates = args.candidates.split(',')
+
     for source, dest, lang in zip(tweet_files, dest_files, lang_codes):
+        # loaded before the workers fork instead of in each of them
+        get_classifier(lang, candidates, args.normalize, args.cache_size)
         func = partial(filter_classify_lang_line, lang, langid_min_prob,
-                       replacements)
+                       replacements, candidates=candidates,
+                       normalize=args.normalize, cache_size=args.cache_size)
         multiprocess = MultiprocessFiles(source, dest, func,
                                          num_procs=args.num_jobs,
-                                         queue_size=args.queue_size)
+                                         queue_size=args.queue_size,
+                                         batch_func=partial(
+                                             apply_stages_batch, [func]))
         multiprocess.run()
 
 
@@ -0,0 +1,275 @@
+"""Codecs for reading and writing the Line Delimited JSON files.
+
+Every stage reads and writes through open_file, so the same code runs against
+plain files, gzip, zstd or lz4. The codec is chosen by file extension or
+explicitly by name:
+
+    plain   - anything without one of the extensions below
+    gzip    - .gz
+    zstd    - .zst (needs the zstandard module)
+    lz4     - .lz4 (needs the lz4 module)
+
+Codecs can also compress a block of data into an independent member (frame)
+so that blocks compressed in parallel can be concatenated into a valid file,
+and decompress a file object, which lets a range of members be read on its
+own (see RangeFile).
+"""
+
+from __future__ import print_function
+import io
+import os
+import sys
+import gzip
+import zlib
+import pkgutil
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# lz4.frame is imported on first use (see Lz4Codec.frame): through future it
+# imports inspect, then tokenize, which this repo shadows and whose imports
+# need this module to be fully loaded
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class RangeFile(object):
+    """Read-only view of the length bytes of fileobj from its position."""
+
+    def __init__(self, fileobj, length):
+        self.fileobj = fileobj
+        self.remaining = length
+
+    def read(self, size=-1):
+        """Reads up to size bytes without going past the range."""
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fileobj.read(size)
+        self.remaining -= len(data)
+        return data
+
+
+class _RawReader(io.RawIOBase):
+    """Adapts an object with a read method to io.BufferedReader."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        data = self.fileobj.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+class _GzipMembersReader(io.RawIOBase):
+    """Decompresses the concatenated gzip members read from fileobj."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.buffer = b''
+        self.offset = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self.offset == len(self.buffer):
+            # a finished member leaves the following ones in unused_data
+            if self.decompressor.unused_data:
+                data = self.decompressor.unused_data
+                self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                data = self.fileobj.read(CHUNK_SIZE)
+                if not data:
+                    return 0
+            self.buffer = self.decompressor.decompress(data)
+            self.offset = 0
+
+        n = min(len(b), len(self.buffer) - self.offset)
+        b[:n] = self.buffer[self.offset:self.offset + n]
+        self.offset += n
+        return n
+
+
+class PlainCodec(object):
+    """Uncompressed files."""
+    name = 'plain'
+    extensions = []
+    default_level = None
+    available = True
+
+    def open(self, path, mode='rb', level=None):
+        """Opens path for reading or writing ('r', 'w' or 'a')."""
+        return open(path, _binary(mode))
+
+    def compress(self, data, level=None):
+        """Returns data as an independent member of a file."""
+        return data
+
+    def reader(self, fileobj):
+        """Returns a file object with the contents of fileobj."""
+        return io.BufferedReader(_RawReader(fileobj), CHUNK_SIZE)
+
+
+class GzipCodec(object):
+    """gzip files, possibly with multiple members."""
+    name = 'gzip'
+    extensions = ['.gz']
+    default_level = 6
+    available = True
+
+    def open(self, path, mode='rb', level=None):
+        """Opens path for reading or writing ('r', 'w' or 'a')."""
+        if level is None:
+            level = self.default_level
+        return gzip.open(path, _binary(mode), level)
+
+    def compress(self, data, level=None):
+        """Returns data compressed as a complete gzip member."""
+        if level is None:
+            level = self.default_level
+        compressor = zlib.compressobj(level, zlib.DEFLATED,
+                                      16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+
+    def reader(self, fileobj):
+        """Returns a file object with the decompressed data of fileobj."""
+        return io.BufferedReader(_GzipMembersReader(fileobj), CHUNK_SIZE)
+
+
+class ZstdCodec(object):
+    """zstd files, possibly with multiple frames."""
+    name = 'zstd'
+    extensions = ['.zst', '.zstd']
+    default_level = 3
+    available = zstandard is not None
+
+    def open(self, path, mode='rb', level=None):
+        """Opens path for reading or writing ('r', 'w' or 'a')."""
+        if level is None:
+            level = self.default_level
+        mode = _binary(mode)
+        if mode == 'rb':
+            decompressor = zstandard.ZstdDecompressor()
+            reader = decompressor.stream_reader(open(path, 'rb'),
+                                                read_across_frames=True)
+            return io.BufferedReader(reader)
+        compressor = zstandard.ZstdCompressor(level=level)
+        return compressor.stream_writer(open(path, mode))
+
+    def compress(self, data, level=None):
+        """Returns data compressed as a complete zstd frame."""
+        if level is None:
+            level = self.default_level
+        return zstandard.ZstdCompressor(level=level).compress(data)
+
+    def reader(self, fileobj):
+        """Returns a file object with the decompressed data of fileobj."""
+        decompressor = zstandard.ZstdDecompressor()
+        return io.BufferedReader(
+            decompressor.stream_reader(fileobj, read_across_frames=True),
+            CHUNK_SIZE)
+
+
+class Lz4Codec(object):
+    """lz4 frame files, possibly with multiple frames."""
+    name = 'lz4'
+    extensions = ['.lz4']
+    default_level = 0
+    _frame = None
+
+    @property
+    def available(self):
+        """True if the lz4 module is installed."""
+        return pkgutil.find_loader('lz4') is not None
+
+    def frame(self):
+        """Returns the lz4.frame module, imported on first use. An installed
+        module that fails to import raises its ImportError.
+        """
+        if Lz4Codec._frame is None:
+            import lz4.frame
+            Lz4Codec._frame = lz4.frame
+        return Lz4Codec._frame
+
+    def open(self, path, mode='rb', level=None):
+        """Opens path for reading or writing ('r', 'w' or 'a')."""
+        if level is None:
+            level = self.default_level
+        # lz4 only takes byte string paths
+        if isinstance(path, unicode):
+            path = path.encode(sys.getfilesystemencoding())
+        return self.frame().open(path, _binary(mode),
+                                 compression_level=level)
+
+    def compress(self, data, level=None):
+        """Returns data compressed as a complete lz4 frame."""
+        if level is None:
+            level = self.default_level
+        return self.frame().compress(data, compression_level=level)
+
+    def reader(self, fileobj):
+        """Returns a file object with the decompressed data of fileobj."""
+        return self.frame().open(fileobj, 'rb')
+
+
+CODECS = dict((codec.name, codec) for codec in
+              [PlainCodec(), GzipCodec(), ZstdCodec(), Lz4Codec()])
+
+
+def _binary(mode):
+    """ 'r' -> 'rb', 'w' -> 'wb', 'a' -> 'ab' """
+    mode = mode.replace('b', '').replace('t', '')
+    return mode[0] + 'b'
+
+
+def get_codec(path=None, name=None):
+    """Returns the codec named name or, if name is None, the one for path.
+
+    Args:
+        path: string
+            file path, its extension selects the codec
+        name: string
+            codec name (plain, gzip, zstd or lz4), overrides the extension
+
+    Raises:
+        ValueError if the codec is unknown or its module is not installed
+    """
+    if name is None:
+        name = 'plain'
+        extension = os.path.splitext(path or '')[1].lower()
+        for codec in CODECS.values():
+            if extension in codec.extensions:
+                name = codec.name
+                break
+
+    if name not in CODECS:
+        raise ValueError('unknown codec %s' % name)
+
+    codec = CODECS[name]
+    if not codec.available:
+        raise ValueError('codec %s needs a module that is not installed'
+                         % name)
+    return codec
+
+
+def open_file(path, mode='rb', codec=None, level=None):
+    """Opens path with the codec named codec or the one for its extension.
+
+    Args:
+        path: string
+            file path
+        mode: string
+            'r', 'w' or 'a' (files are always binary)
+        codec: string
+            codec name, by default chosen by the extension of path
+        level: int
+            compression level, codec default if None
+    """
+    return get_codec(path, codec).open(path, mode, level)
@@ -0,0 +1,315 @@
+"""Removes copies and retweets of tweets in parallel.
+
+filter_unique keeps the first tweet with a given id or retweet_id, reading
+the whole file in one process. Here the tweets are first split into
+partitions by their dedup key, the id of the original tweet (the retweet_id
+of a retweet, the id of anything else), so that a tweet, its copies and its
+retweets all end up in the same partition and partitions can be
+deduplicated independently, each by its own process. The deduplicated
+partitions are then concatenated.
+
+Tweets can also be deduplicated by text, copy-pasted spam and the like. The
+text is normalized (lowercased, whitespace collapsed) and hashed to a 128 bit
+md5 digest, which is also the dedup key: its first bytes choose the
+partition and each partition keeps the set of digests it has seen. Memory is
+bounded by the size of a partition, not of the corpus, as there are enough
+partitions for MAX_PARTITION_LINES tweets each (estimated from the file size
+when the input has no index).
+
+Tweets keep their order within a partition, so the tweets kept are the same
+as with filter_unique, but the output is grouped by partition. This assumes
+that a retweet_id is the id of an original tweet, not of another retweet, as
+in the retweeted_status of Twitter's retweets.
+"""
+
+from __future__ import print_function
+import os
+import json
+import struct
+import hashlib
+import argparse
+import multiprocessing
+from functools import partial
+
+from MultiprocessFiles import MultiprocessFiles, Sink
+from pipeline import load_tweet
+from filter_unique import unique_tweets
+from compression import open_file, get_codec
+from idstore import IdSet
+import ldindex
+
+# spreads the ids over the partitions, the low bits of tweet ids are a
+# sequence number that is mostly 0
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+HASH_MASK = (1 << 64) - 1
+# tweets per partition, bounds the memory of each dedup process
+MAX_PARTITION_LINES = 1000000
+# estimate the tweets of a file without an index from its size. Both are on
+# the low side, too many partitions only cost more files
+BYTES_PER_LINE = 500
+COMPRESSION_RATIO = 5
+
+
+def dedup_key(tweet):
+    """ Returns the id of the original tweet of tweet, as an int (ids may be
+    strings, e.g. the id_str of newsfeed_tweets)
+    """
+    if 'retweet_id' in tweet:
+        return int(tweet['retweet_id'])
+    return int(tweet.get('id', 0))
+
+
+def normalize_text(text):
+    """ Returns text lowercased and with its whitespace collapsed """
+    return u' '.join(text.lower().split())
+
+
+def text_digest(tweet):
+    """ Returns the md5 digest of the normalized text of tweet """
+    return hashlib.md5(normalize_text(tweet['text']).encode('utf-8')).digest()
+
+
+def partition_of(key, num_partitions, by='id'):
+    """ Returns the partition of the dedup key, an id or a text digest (see
+    KEYS), among num_partitions
+    """
+    if by == 'text':
+        # digests are already uniformly spread
+        return struct.unpack('>I', key[:4])[0] % num_partitions
+    return (((key * HASH_MULTIPLIER) & HASH_MASK) >> 32) % num_partitions
+
+
+def unique_texts(lines, digests):
+    """Yields the tweets of lines whose text digest is not in digests,
+    adding it: only the first tweet with a given normalized text is kept.
+    """
+    for line in lines:
+        try:
+            tweet = json.loads(line)
+        except:
+            continue
+
+        digest = text_digest(tweet)
+        if digest in digests:
+            continue
+        digests.add(digest)
+
+        yield tweet
+
+
+# dedup key and filter of each kind of dedup
+KEYS = {'id': dedup_key, 'text': text_digest}
+FILTERS = {'id': lambda lines: unique_tweets(lines, IdSet()),
+           'text': lambda lines: unique_texts(lines, set())}
+
+
+def estimate_lines(path):
+    """Returns the number of tweets of path, from its index (see ldindex)
+    or estimated from its size.
+    """
+    lines = ldindex.count_lines(path)
+    if lines is not None:
+        return lines
+    size = os.path.getsize(path)
+    if get_codec(path).name != 'plain':
+        size *= COMPRESSION_RATIO
+    return size // BYTES_PER_LINE
+
+
+def num_partitions_for(path, num_procs=0):
+    """Returns the number of partitions for the tweets of path: one per
+    process, more if there are over MAX_PARTITION_LINES tweets per partition
+    (see estimate_lines).
+    """
+    num_partitions = num_procs or multiprocessing.cpu_count()
+    lines = estimate_lines(path)
+    if lines:
+        num_partitions = max(num_partitions,
+                             -(-lines // MAX_PARTITION_LINES))
+    return num_partitions
+
+
+def partition_route(route, num_partitions, line, by='id'):
+    """Routes line like route, then to the partition of its dedup key.
+
+    Args:
+        route: function
+            returns an (output name, tweet) pair or None for a tweet, None
+            to send every tweet to the same output
+        num_partitions: int
+            number of partitions of each output
+        line: string or dictionary
+            tweet to be routed
+        by: string
+            dedup key, 'id' or 'text' (see KEYS)
+
+    Returns:
+        an ((output name, partition), tweet) pair or None
+    """
+    if route is None:
+        try:
+            routed = (None, load_tweet(line))
+        except:
+            return None
+    else:
+        routed = route(line)
+        if routed is None:
+            return None
+
+    name, tweet = routed
+    partition = partition_of(KEYS[by](tweet), num_partitions, by)
+    return ((name, partition), tweet)
+
+
+def partition_path(path, partition, suffix=''):
+    """ Returns the path of partition of path, with the same codec """
+    root = path
+    extension = ''
+    for candidate in get_codec(path).extensions:
+        if path.endswith(candidate):
+            root = path[:-len(candidate)]
+            extension = candidate
+    return '%s.part%d%s%s' % (root, partition, suffix, extension)
+
+
+def partition_sinks(outfiles, num_partitions):
+    """Returns the sinks of partition_route for outfiles, a dictionary from
+    output names to paths.
+
+    Sinks are appended to, partitions left by an interrupted run are removed.
+    """
+    sinks = {}
+    for name, path in outfiles.items():
+        for partition in range(num_partitions):
+            part = partition_path(path, partition)
+            if os.path.exists(part):
+                os.remove(part)
+            # only read from start to end by a single process
+            sinks[(name, partition)] = Sink(part, index=False)
+    return sinks
+
+
+def dedup_partition(job):
+    """Keeps the first of the tweets of a partition with the same key.
+
+    Args:
+        job: tuple
+            (partition path, output path, compression level, dedup key),
+            the partition is removed
+
+    Returns:
+        number of tweets read and kept
+    """
+    infile, outfile, level, by = job
+    counter = [0]
+
+    def counted(source):
+        for line in source:
+            counter[0] += 1
+            yield line
+
+    with open_file(infile, 'r') as source:
+        lines = (json.dumps(tweet) + '\n'
+                 for tweet in FILTERS[by](counted(source)))
+        index = ldindex.write_blocks(lines, outfile, member_mb=4, level=level)
+    os.remove(infile)
+    return counter[0], index['lines']
+
+
+def dedup_partitions(outfiles, num_partitions, num_procs=0, level=None,
+                     by='id'):
+    """Deduplicates the partitions written for outfiles in parallel and
+    concatenates those of each of outfiles into it.
+
+    Args:
+        outfiles: dictionary
+            maps output names to paths
+        num_partitions: int
+            number of partitions of each output
+        num_procs: int
+            number of processes, 0 for one per core
+        level: int
+            compression level of the outputs
+        by: string
+            dedup key, 'id' or 'text'
+
+    Returns:
+        dictionary with the number of duplicates dropped from each output
+    """
+    jobs = []
+    for name, path in sorted(outfiles.items()):
+        for partition in range(num_partitions):
+            jobs.append((partition_path(path, partition),
+                         partition_path(path, partition, '.uniq'), level, by))
+
+    pool = multiprocessing.Pool(num_procs or None)
+    try:
+        results = pool.map(dedup_partition, jobs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+    duplicates = {}
+    for i, (name, path) in enumerate(sorted(outfiles.items())):
+        parts = [partition_path(path, partition, '.uniq')
+                 for partition in range(num_partitions)]
+        ldindex.concatenate(parts, path)
+        counts = results[i * num_partitions:(i + 1) * num_partitions]
+        duplicates[name] = sum(read - kept for read, kept in counts)
+    return duplicates
+
+
+def dedup_file(infile, outfile, num_partitions=0, by='id', level=None,
+               **kwargs):
+    """Removes duplicates from infile, writing outfile.
+
+    Args:
+        num_partitions: int
+            0 chooses it with num_partitions_for
+        by: string
+            dedup key, 'id' or 'text'
+        level: int
+            compression level of outfile
+        kwargs:
+            options of the MultiprocessFiles run splitting infile
+
+    Returns:
+        number of duplicates dropped
+    """
+    if num_partitions == 0:
+        num_partitions = num_partitions_for(infile, kwargs.get('num_procs'))
+    outfiles = {None: outfile}
+    func = partial(partition_route, None, num_partitions, by=by)
+    split = MultiprocessFiles(infile, partition_sinks(outfiles,
+                                                      num_partitions),
+                              func, **kwargs)
+    split.run()
+    return dedup_partitions(outfiles, num_partitions,
+                            kwargs.get('num_procs', 0), level, by)[None]
+
+
+def main():
+    """ main """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('infile')
+    parser.add_argument('outfile')
+    parser.add_argument('-p', '--partitions', type=int, default=0,
+                        help='number of partitions. Default: number of \
+                              processes or more for large files')
+    parser.add_argument('-b', '--by', choices=sorted(KEYS), default='id',
+                        help='drop copies and retweets (id) or tweets with \
+                              the same normalized text (text)')
+    parser.add_argument('-n', '--num_jobs', type=int, default=0,
+                        help='number of worker processes to use. Default: \
+                              number of cores')
+    parser.add_argument('-s', '--queue_size', type=int, default=2000)
+    args = parser.parse_args()
+
+    duplicates = dedup_file(args.infile, args.outfile, args.partitions,
+                            args.by, num_procs=args.num_jobs,
+                            queue_size=args.queue_size)
+    print('%s: %d duplicates dropped' % (args.outfile, duplicates))
+
+
+if __name__ == '__main__':
+    main()
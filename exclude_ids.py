@@ -9,18 +9,20 @@ Removes tweets by id
 from __future__ import print_function
 from __future__ import division
 import sys
-import json
-import gzip
 import argparse
 from functools import partial
 
+from pipeline import load_tweet
+from compression import open_file
+from idstore import IdStore
+
 
 def exclude_ids(ids, tweet_line):
-    """Returns tweet if it tweet id is not in ids
+    """Returns tweet if it tweet id is not in ids (a set or an IdStore)
     Returns: A dictionary
     """
     try:
-        tweet = json.loads(tweet_line)
+        tweet = load_tweet(tweet_line)
     except:
         return None
 
@@ -37,6 +39,19 @@ def exclude_ids(ids, tweet_line):
     return tweet
 
 
+def exclude_route(ids, route, tweet_line):
+    """Routes tweet_line like route, unless its tweet id is in ids (see
+    exclude_ids). Lets the ids be excluded in the same pass that splits the
+    tweets, before anything else sees them.
+
+    Returns: an (output name, tweet) pair or None
+    """
+    routed = route(tweet_line)
+    if routed is None or exclude_ids(ids, routed[1]) is None:
+        return None
+    return routed
+
+
 def main():
     """ main """
 
@@ -53,11 +68,10 @@ def main():
         print('no ids file provided')
         sys.exit(0)
 
-    idlist = open(args.ids_file, 'r').readlines()
-    idlist = set([int(x.strip()) for x in idlist])
+    idlist = IdStore.from_ids_file(args.ids_file)
     f = partial(exclude_ids, idlist)
 
-    with gzip.open(infile) as fin, gzip.open(outfile, 'w') as fout:
+    with open_file(infile) as fin, open_file(outfile, 'w') as fout:
         for line in fin:
             tweet = f(line)
             if tweet is not None:
@@ -17,15 +17,19 @@ from __future__ import print_function
 import sys
 import os
 import re
-import gzip
 import json
-import codecs
+import struct
+import hashlib
 import itertools
 import random
 import argparse
 import multiprocessing
 from functools import partial
 
+from MultiprocessFiles import MultiprocessFiles, Sink
+from pipeline import load_tweet
+import ldindex
+
 
 pos_smileys = [u':)', u':D', u':-)', u':-))', u':]', u'=)', u'(:', u':o)']
 neg_smileys = [u':(', u';(', u':-(', u':-[', u":'(", u":[", u":{", u">:("]
@@ -68,37 +72,50 @@ all_emoji = [unichr(x) for x in range(int('1F600', 16), int('1F64F', 16))]
 unambigous = neg_smileys + pos_smileys
 ambigous = [x for x in all_emoji if x not in unambigous]
 
+# compiled once, lookups take constant time whatever the number of smileys
+pos_set = frozenset(pos_smileys)
+neg_set = frozenset(neg_smileys)
+# any smiley anywhere in a text, longest first
+smiley_re = re.compile(u'|'.join(re.escape(x) for x in
+                                 sorted(pos_set | neg_set, key=len,
+                                        reverse=True)), re.UNICODE)
+
 
 POS = True
 NEG = False
+# output file of each label
+LABELS = {POS: 'pos', NEG: 'neg', None: 'other'}
 random.seed()
 
 
-def process_line(prob_smiley, json_line):
+def record_random(seed, tweet_id):
+    '''
+    Returns a number in [0, 1) that only depends on seed and tweet_id, so the
+    coin flipped for a tweet is the same whichever process handles it.
+    '''
+    digest = hashlib.md5('%s:%s' % (seed, tweet_id)).digest()
+    return (struct.unpack('<Q', digest[:8])[0] >> 11) / float(1 << 53)
+
+
+def process_line(prob_smiley, json_line, seed=None):
     '''
     Identifies smileys or lack of them.
     If they exist they are removed.
     text is lowered (converted to lower case)
     < min_tokens => discarded
+
+    With a seed the decision to remove a smiley is derived from the seed and
+    the tweet id, otherwise it is random.
     '''
 
-    unicode_line = json.loads(json_line)['text'].strip()
+    tweet = json.loads(json_line)
+    unicode_line = tweet['text'].strip()
 
     tokens = unicode_line.split()
 
     # handle well tokenized text
-    has_pos = False
-    has_neg = False
-
-    for sm in pos_smileys:
-        if sm in tokens:
-            has_pos = True
-            break
-
-    for sm in neg_smileys:
-        if sm in tokens:
-            has_neg = True
-            break
+    has_pos = not pos_set.isdisjoint(tokens)
+    has_neg = not neg_set.isdisjoint(tokens)
 
     if not has_neg and not has_pos:
         return (None, unicode_line)  # No smileys
@@ -107,18 +124,22 @@ def process_line(prob_smiley, json_line):
         return (None, unicode_line)  # Ambiguous
 
     # "Flip a coin to see if smiley will be removed
-    remove_smiley = random.random() > prob_smiley
+    if seed is None:
+        coin = random.random()
+    else:
+        coin = record_random(seed, tweet.get('id'))
+    remove_smiley = coin > prob_smiley
 
     if has_pos:
         if remove_smiley:
-            tokens = [x for x in tokens if x not in pos_smileys]
+            tokens = [x for x in tokens if x not in pos_set]
 
         unicode_line = u' '.join(tokens)
         return (POS, unicode_line)
 
     if has_neg:
         if remove_smiley:
-            tokens = [x for x in tokens if x not in neg_smileys]
+            tokens = [x for x in tokens if x not in neg_set]
 
         unicode_line = u' '.join(tokens)
         return (NEG, unicode_line)
@@ -127,58 +148,92 @@ def process_line(prob_smiley, json_line):
     return None
 
 
+def smiley_prefilter(other_fraction, seed, tweet_line):
+    '''
+    Cheap test on the raw text, before preprocessing and tokenization: keeps
+    the tweets where a smiley appears, even inside a word, and other_fraction
+    of the rest, chosen by tweet id.
+    Returns: A dictionary
+    '''
+    try:
+        tweet = load_tweet(tweet_line)
+    except:
+        return None
+
+    if smiley_re.search(tweet.get('text', u'')):
+        return tweet
+
+    if record_random('%s:other' % seed, tweet.get('id')) < other_fraction:
+        return tweet
+
+    return None
+
+
+def label_line(prob_smiley, seed, json_line):
+    '''
+    Returns (output name, text) where the name is pos, neg or other.
+    '''
+    res = process_line(prob_smiley, json_line, seed)
+    if res is None:
+        return None
+    return (LABELS[res[0]], res[1])
+
+
+def dumps_text(unicode_line):
+    ''' Serializes a text as an utf8 encoded line '''
+    return unicode_line.encode('utf-8') + '\n'
+
+
+def label_tweets(infile, output_directory, prob_smiley, seed=None,
+                 **kwargs):
+    '''
+    Writes pos.txt, neg.txt and other.txt to output_directory in parallel.
+    kwargs are passed to MultiprocessFiles.
+
+    Returns:
+        dictionary with the number of lines written to each file
+    '''
+    sinks = {}
+    for name in LABELS.values():
+        path = os.path.join(output_directory, name + '.txt')
+        # the writer appends
+        if os.path.exists(path):
+            ldindex.remove(path)
+        # plain text deliverables, nothing reads them at random
+        sinks[name] = Sink(path, dumps=dumps_text, index=False)
+
+    func = partial(label_line, prob_smiley, seed)
+    labelling = MultiprocessFiles(infile, sinks, func, **kwargs)
+    counts = labelling.run()
+    for name in ['pos', 'neg', 'other']:
+        counts.setdefault(name, 0)
+    print('%s: pos = %d neg = %d other = %d' % (infile, counts['pos'],
+                                               counts['neg'], counts['other']))
+    return counts
+
+
 def main():
     ''' Main '''
-    # Stats Vars
-    n_pos = 0
-    n_neg = 0
-    n = 0
-
     # arguments
     parser = argparse.ArgumentParser()
 
-    # parser.add_argument('-n', '--num_jobs', action="store", 
-    # dest="num_jobs", type=int, default=0)
+    parser.add_argument('-n', '--num_jobs', action="store",
+                        dest="num_jobs", type=int, default=0)
 
-    parser.add_argument('-p', '--prob_smiley', action="store", 
+    parser.add_argument('-p', '--prob_smiley', action="store", type=float,
                         dest="prob_smiley", default=0.4)
+    parser.add_argument('-s', '--seed', type=int,
+                        help='makes the removal of smileys reproducible')
+    parser.add_argument('-w', '--num_writers', type=int, default=1,
+                        help='processes writing the output files')
 
     parser.add_argument('input_tweet_file')
     parser.add_argument('output_directory')
     args = parser.parse_args()
 
-    # open output files
-    pos_path = os.path.join(args.output_directory, 'pos.txt')
-    f_pos = codecs.open(pos_path, 'w', encoding='utf-8')
-
-    neg_path = os.path.join(args.output_directory, 'neg.txt')
-    f_neg = codecs.open(neg_path, 'w', encoding='utf-8')
-
-    other_path = os.path.join(args.output_directory, 'other.txt')
-    f_other = codecs.open(other_path, 'w', encoding='utf-8')
-
-
-    # Read and Process
-    with gzip.open(args.input_tweet_file, 'r') as f:
-        for line in f:
-            res = process_line(args.prob_smiley, line)
-            n += 1
-
-            if res is None:
-                continue
-            if res[0] is None:
-                f_other.write(res[1] + u'\n')
-            if res[0] == POS:
-                n_pos += 1
-                f_pos.write(res[1] + u'\n')
-            if res[0] == NEG:
-                f_neg.write(res[1] + u'\n')
-                n_neg += 1
-
-    # explicitly close files
-    f_pos.close()
-    f_neg.close()
-    f_other.close()
+    label_tweets(args.input_tweet_file, args.output_directory,
+                 args.prob_smiley, args.seed, num_procs=args.num_jobs,
+                 num_writers=args.num_writers)
 
 
 if __name__ == '__main__':
@@ -11,11 +11,11 @@ Outputs only those with the selected language.
 from __future__ import print_function
 from __future__ import division
 import sys
-import json
 import argparse
 from functools import partial
 
 from MultiprocessFiles import MultiprocessFiles
+from pipeline import load_tweet
 
 
 def filter_line(lang, tweet_line):
@@ -32,7 +32,7 @@ def filter_line(lang, tweet_line):
     Returns: A dictionary
     """
     try:
-        tweet = json.loads(tweet_line)
+        tweet = load_tweet(tweet_line)
     except:
         return None
 
@@ -66,6 +66,36 @@ def filter_line(lang, tweet_line):
     return ntweet
 
 
+def route_line(langs, tweet_line):
+    """Returns (lang, tweet) if tweet is in one of the 'langs' languages.
+
+    Lets a single pass over the input split tweets into one output per
+    language.
+
+    Args:
+        langs: set of strings
+            BCP 47 language identifiers
+        tweet_line: JSON object
+            represents one tweet
+
+    Returns: A (string, dictionary) tuple
+    """
+    try:
+        tweet = load_tweet(tweet_line)
+    except:
+        return None
+
+    lang = tweet.get('lang')
+    if lang not in langs:
+        return None
+
+    ntweet = filter_line(lang, tweet)
+    if ntweet is None:
+        return None
+
+    return (lang, ntweet)
+
+
 def main():
     """ main """
     lang_codes = ['en']
@@ -92,13 +122,12 @@ def main():
         print('Output files and language codes do not match in size')
         sys.exit(0)
 
-    for lang_code, outfile in zip(lang_codes, outfiles):
-        func = partial(filter_line, lang_code)
-        print('Using %s as language code' % lang_code)
-        multiprocess = MultiprocessFiles(infile, outfile, func,
-                                         num_procs=args.num_jobs,
-                                         queue_size=args.queue_size)
-        multiprocess.run()
+    print('Using %s as language codes' % ', '.join(lang_codes))
+    func = partial(route_line, set(lang_codes))
+    multiprocess = MultiprocessFiles(infile, dict(zip(lang_codes, outfiles)),
+                                     func, num_procs=args.num_jobs,
+                                     queue_size=args.queue_size)
+    multiprocess.run()
 
 
 if __name__ == '__main__':
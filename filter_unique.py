@@ -1,27 +1,38 @@
 import argparse
-import gzip
 import json
 
+from compression import open_file
+from idstore import IdSet
 
-def make_unique(infile, outfile, tweet_ids):
-    fout = gzip.open(outfile, 'w')
-    with gzip.open(infile, 'r') as source:
-        for line in source:
-            try:
-                tweet = json.loads(line)
-            except:
-                continue
 
-            if tweet['id'] in tweet_ids:
-                continue
+def unique_tweets(lines, tweet_ids):
+    """Yields the tweets of lines whose id and retweet_id are not in
+    tweet_ids, adding both to it: only the first of the copies and retweets
+    of a tweet is kept.
+    """
+    for line in lines:
+        try:
+            tweet = json.loads(line)
+        except:
+            continue
+
+        if tweet['id'] in tweet_ids:
+            continue
+
+        if 'retweet_id' in tweet and tweet['retweet_id'] in tweet_ids:
+            continue
 
-            if 'retweet_id' in tweet and tweet['retweet_id'] in tweet_ids:
-                continue
+        tweet_ids.add(tweet['id'])
+        if 'retweet_id' in tweet:
+            tweet_ids.add(tweet['retweet_id'])
 
-            tweet_ids.add(tweet['id'])
-            if 'retweet_id' in tweet:
-                tweet_ids.add(tweet['retweet_id'])
+        yield tweet
 
+
+def make_unique(infile, outfile, tweet_ids):
+    fout = open_file(outfile, 'w')
+    with open_file(infile, 'r') as source:
+        for tweet in unique_tweets(source, tweet_ids):
             tweet_string = json.dumps(tweet) + '\n'
             fout.write(tweet_string)
 
@@ -34,7 +45,7 @@ def main():
     parser.add_argument('infile')
     parser.add_argument('outfile')
     args = parser.parse_args()
-    tweet_ids = set()
+    tweet_ids = IdSet()
     make_unique(args.infile, args.outfile, tweet_ids)
 
 
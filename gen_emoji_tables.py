@@ -0,0 +1,127 @@
+"""
+Generates emoji_tables.py, the emoji tables used by twokenize, from
+emoji-data.txt. Run it again after updating emoji-data.txt:
+
+    python gen_emoji_tables.py
+
+Parsing the file and building the regex at every import of twokenize cost
+every worker process that starts, the generated module is only loaded.
+"""
+
+from __future__ import print_function
+import os
+import re
+import codecs
+import argparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def read_emoji_data(path):
+    """Returns the single code points and the pairs of code points listed in
+    an emoji-data.txt file, in file order.
+    """
+    singles = []
+    pairs = []
+    with open(path, 'r') as source:
+        for line in source:
+            line = line.strip()
+            if line.startswith('#'):
+                continue
+            codes = [int(x, 16) for x in line.split(';')[0].split()]
+            if len(codes) == 1:
+                singles.append(codes[0])
+            elif len(codes) == 2:
+                pairs.append(tuple(codes))
+    return singles, pairs
+
+
+def char_class(chars):
+    """Returns a regex character class matching chars, runs of consecutive
+    code points are written as ranges."""
+    def escape(code):
+        char = unichr(code)
+        if char in u'\\]^-[':
+            return u'\\' + char
+        return char
+
+    codes = sorted(set(ord(x) for x in chars))
+    parts = []
+    i = 0
+    while i < len(codes):
+        j = i
+        while j + 1 < len(codes) and codes[j + 1] == codes[j] + 1:
+            j += 1
+        if j - i >= 2:
+            parts.append(escape(codes[i]) + u'-' + escape(codes[j]))
+        else:
+            parts.extend(escape(code) for code in codes[i:j + 1])
+        i = j + 1
+    return u'[' + u''.join(parts) + u']'
+
+
+def emoji_regex(singles, pairs):
+    """Returns a regex with one group matching an emoji.
+
+    Equivalent to the alternation of singles followed by pairs: a single
+    code point is preferred, then a pair, whose second code points are
+    grouped by their first one (a trie of depth two).
+    """
+    seconds = {}
+    for pair in pairs:
+        seconds.setdefault(pair[0], []).append(pair[1])
+    trie = [re.escape(first) + char_class(rest)
+            for first, rest in sorted(seconds.items())]
+    return u'(' + u'|'.join([char_class(singles)] + trie) + u')'
+
+
+def write_tables(path, singles, pairs):
+    """Writes the tables and the regex built from them as a python module."""
+    pattern = emoji_regex([unichr(x) for x in singles],
+                          [unichr(x) + unichr(y) for x, y in pairs])
+
+    with codecs.open(path, 'w', encoding='utf-8') as destination:
+        destination.write('# -*- coding: utf-8 -*-\n')
+        destination.write('"""Emoji tables of twokenize.\n\n'
+                          'Generated from emoji-data.txt by '
+                          'gen_emoji_tables.py, do not edit.\n"""\n\n')
+
+        destination.write('# code points that are emoji on their own\n')
+        destination.write('EMOJI_SINGLES = [\n')
+        for i in range(0, len(singles), 8):
+            destination.write('    ' + ', '.join('0x%04X' % x for x in
+                                                 singles[i:i + 8]) + ',\n')
+        destination.write(']\n\n')
+
+        destination.write('# pairs of code points that are an emoji\n')
+        destination.write('EMOJI_PAIRS = [\n')
+        for i in range(0, len(pairs), 4):
+            destination.write('    ' + ', '.join('(0x%04X, 0x%04X)' % pair
+                                                 for pair in pairs[i:i + 4])
+                              + ',\n')
+        destination.write(']\n\n')
+
+        destination.write('# regex with one group matching an emoji, see '
+                          'gen_emoji_tables.emoji_regex\n')
+        destination.write('EMOJI_PATTERN = (\n')
+        for i in range(0, len(pattern), 6):
+            destination.write('    %r\n' % pattern[i:i + 6])
+        destination.write(')\n')
+
+
+def main():
+    """ main """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i', '--input',
+                        default=os.path.join(HERE, 'emoji-data.txt'))
+    parser.add_argument('-o', '--output',
+                        default=os.path.join(HERE, 'emoji_tables.py'))
+    args = parser.parse_args()
+
+    singles, pairs = read_emoji_data(args.input)
+    write_tables(args.output, singles, pairs)
+    print('%s: %d emoji, %d pairs' % (args.output, len(singles), len(pairs)))
+
+
+if __name__ == '__main__':
+    main()
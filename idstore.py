@@ -0,0 +1,136 @@
+"""Compact stores of tweet ids.
+
+A Python set of ints costs around 70 bytes per id and forked workers that
+look ids up touch the reference counts, which copies the set's pages into
+every worker. These stores keep the ids in sorted int64 arrays (8 bytes per
+id) that are searched with binary search.
+
+IdStore is read-only and memory-mapped from a file of raw int64 values built
+once from an ids file and kept next to it, so it persists between runs and
+its pages are shared by all the MultiprocessFiles workers.
+
+IdSet grows, for deduplication: new ids go to a small set that is merged
+into the sorted array when it gets large.
+"""
+
+from __future__ import print_function
+import os
+import argparse
+
+import numpy as np
+
+
+def read_ids(ids_file):
+    """Returns the sorted unique ids of ids_file, one id per line."""
+    with open(ids_file, 'r') as source:
+        ids = np.fromiter((int(x) for x in source if x.strip()),
+                          dtype=np.int64)
+    return np.unique(ids)
+
+
+class IdStore(object):
+    """Read-only set of ids in a memory-mapped sorted int64 array.
+
+    Attributes:
+        ids: numpy array
+            sorted unique ids
+    """
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    @classmethod
+    def load(cls, path):
+        """Memory-maps the store saved in path."""
+        if os.path.getsize(path) == 0:
+            return cls(np.zeros(0, dtype=np.int64))
+        return cls(np.memmap(path, dtype=np.int64, mode='r'))
+
+    @classmethod
+    def from_ids_file(cls, ids_file, path=None):
+        """Returns the store of ids_file, building and saving it to path
+        (ids_file + '.i64' by default) unless it is already up to date.
+        """
+        if path is None:
+            path = ids_file + '.i64'
+        if (not os.path.exists(path) or
+                os.path.getmtime(path) < os.path.getmtime(ids_file)):
+            # raw values, np.save imports tokenize which this repo shadows.
+            # Written aside and renamed so that an interrupted or concurrent
+            # build never leaves a truncated store
+            partial_path = '%s.%d' % (path, os.getpid())
+            read_ids(ids_file).tofile(partial_path)
+            os.rename(partial_path, path)
+        return cls.load(path)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, tweet_id):
+        i = np.searchsorted(self.ids, tweet_id)
+        return i < len(self.ids) and self.ids[i] == tweet_id
+
+    def contains(self, tweet_ids):
+        """Returns a boolean array, True for the tweet_ids in the store."""
+        tweet_ids = np.asarray(tweet_ids, dtype=np.int64)
+        i = np.searchsorted(self.ids, tweet_ids)
+        found = np.zeros(len(tweet_ids), dtype=bool)
+        inside = i < len(self.ids)
+        found[inside] = self.ids[i[inside]] == tweet_ids[inside]
+        return found
+
+
+class IdSet(object):
+    """Growable set of ids, a drop-in for the set used by make_unique. Ids
+    may be ints or strings of digits, they are compared as ints.
+
+    Attributes:
+        ids: numpy array
+            sorted unique ids already merged
+        recent: set
+            ids added since the last merge
+        min_merge: int
+            number of recent ids that triggers a merge
+    """
+
+    def __init__(self, min_merge=1000000):
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.recent = set()
+        self.min_merge = min_merge
+
+    def __contains__(self, tweet_id):
+        tweet_id = int(tweet_id)
+        if tweet_id in self.recent:
+            return True
+        i = np.searchsorted(self.ids, tweet_id)
+        return i < len(self.ids) and self.ids[i] == tweet_id
+
+    def add(self, tweet_id):
+        """Adds tweet_id to the set."""
+        self.recent.add(int(tweet_id))
+        # merging costs a copy of the array, so merge less often as it grows
+        if len(self.recent) >= max(self.min_merge, len(self.ids) // 8):
+            self.merge()
+
+    def merge(self):
+        """Merges the recent ids into the sorted array."""
+        recent = np.fromiter(self.recent, dtype=np.int64,
+                             count=len(self.recent))
+        self.ids = np.union1d(self.ids, recent)
+        self.recent = set()
+
+
+def main():
+    """ main """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('ids_file', help='file with one tweet id per line')
+    parser.add_argument('-o', '--output',
+                        help='store path, default: ids_file.i64')
+    args = parser.parse_args()
+
+    store = IdStore.from_ids_file(args.ids_file, args.output)
+    print('%d ids' % len(store))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+"""Sidecar index for random access into Line Delimited JSON files.
+
+The index of a file lives in path + '.idx' and lists checkpoints, places
+where reading can start without decompressing what comes before them. For
+compressed files these are the starts of members (gzip members, zstd or lz4
+frames), for uncompressed files the starts of lines. The index is JSON:
+
+    {"size": <file size in bytes>,
+     "usize": <uncompressed size in bytes>,
+     "lines": <number of lines>,
+     "checkpoints": [[offset, uncompressed offset, line number], ...]}
+
+MultiprocessFiles records a checkpoint for every member it writes. For other
+files build_index makes one in a single pass, with a checkpoint at the first
+member boundary after every checkpoint_mb of uncompressed data. A file
+compressed as a single gzip member (e.g. by gzip itself) only gets the
+checkpoint at its start; reblock rewrites it as a sequence of members.
+
+An index whose size does not match the file is stale and ignored.
+
+open_at_line and open_at_offset use the index to start reading at a given
+line or uncompressed byte offset.
+"""
+
+from __future__ import print_function
+import os
+import sys
+import json
+import zlib
+import bisect
+import argparse
+
+from compression import get_codec, open_file, RangeFile, CHUNK_SIZE
+
+
+def index_path(path):
+    """Returns the path of the index of path."""
+    return path + '.idx'
+
+
+def read_index(path):
+    """Returns the index of path or None if it is missing or stale."""
+    try:
+        with open(index_path(path), 'r') as source:
+            index = json.load(source)
+    except (IOError, ValueError):
+        return None
+
+    if not os.path.exists(path) or index.get('size') != os.path.getsize(path):
+        return None
+
+    return index
+
+
+def write_index(path, index):
+    """Writes the index of path."""
+    with open(index_path(path), 'w') as destination:
+        json.dump(index, destination)
+
+
+def remove(path):
+    """Removes path and its index."""
+    os.remove(path)
+    if os.path.exists(index_path(path)):
+        os.remove(index_path(path))
+
+
+def new_index():
+    """Returns the index of an empty file."""
+    return {'size': 0, 'usize': 0, 'lines': 0, 'checkpoints': []}
+
+
+def _gzip_members(source):
+    """Yields (offset, data) for each gzip member in source, data being its
+    decompressed contents.
+    """
+    position = 0
+    offset = 0
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    parts = []
+    data = source.read(CHUNK_SIZE)
+    position += len(data)
+    while data:
+        parts.append(decompressor.decompress(data))
+        if decompressor.unused_data:
+            # the member ended, what is left belongs to the next ones
+            data = decompressor.unused_data
+            yield offset, ''.join(parts)
+            offset = position - len(data)
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            parts = []
+        else:
+            data = source.read(CHUNK_SIZE)
+            position += len(data)
+    parts.append(decompressor.flush())
+    if offset < position:
+        yield offset, ''.join(parts)
+
+
+def _plain_blocks(source):
+    """Yields (offset, data) for blocks of whole lines of source."""
+    offset = 0
+    rest = ''
+    data = source.read(CHUNK_SIZE)
+    while data:
+        data = rest + data
+        end = data.rfind('\n') + 1
+        if end:
+            yield offset, data[:end]
+            offset += end
+        rest = data[end:]
+        data = source.read(CHUNK_SIZE)
+    if rest:
+        yield offset, rest
+
+
+def build_index(path, checkpoint_mb=16, codec=None):
+    """Indexes path in a single pass and writes the index next to it.
+
+    Args:
+        path: string
+            path of a plain or gzip file
+        checkpoint_mb: int
+            minimum amount of uncompressed data between checkpoints
+        codec: string
+            codec of path, by default chosen by its extension
+
+    Returns:
+        the index
+    """
+    codec = get_codec(path, codec)
+    if codec.name == 'gzip':
+        blocks = _gzip_members
+    elif codec.name == 'plain':
+        blocks = _plain_blocks
+    else:
+        raise ValueError('can not index %s files, only those written by '
+                         'MultiprocessFiles' % codec.name)
+
+    checkpoint_size = checkpoint_mb * 1024 * 1024
+    index = new_index()
+    last_checkpoint = None
+    with open(path, 'rb') as source:
+        for offset, data in blocks(source):
+            if (last_checkpoint is None or
+                    index['usize'] - last_checkpoint >= checkpoint_size):
+                index['checkpoints'].append([offset, index['usize'],
+                                             index['lines']])
+                last_checkpoint = index['usize']
+            index['usize'] += len(data)
+            index['lines'] += data.count('\n')
+
+    index['size'] = os.path.getsize(path)
+    write_index(path, index)
+    return index
+
+
+def write_blocks(lines, outfile, member_mb=16, level=None):
+    """Writes lines to outfile as a sequence of independent members of about
+    member_mb of uncompressed lines each, and indexes it.
+    """
+    codec = get_codec(outfile)
+    member_size = member_mb * 1024 * 1024
+    index = new_index()
+
+    def write_member(destination, lines):
+        data = ''.join(lines)
+        member = codec.compress(data, level)
+        index['checkpoints'].append([index['size'], index['usize'],
+                                     index['lines']])
+        destination.write(member)
+        index['size'] += len(member)
+        index['usize'] += len(data)
+        index['lines'] += len(lines)
+
+    with open(outfile, 'wb') as destination:
+        block = []
+        size = 0
+        for line in lines:
+            block.append(line)
+            size += len(line)
+            if size >= member_size:
+                write_member(destination, block)
+                block = []
+                size = 0
+        if block:
+            write_member(destination, block)
+
+    write_index(outfile, index)
+    return index
+
+
+def reblock(infile, outfile, member_mb=16, level=None):
+    """Rewrites infile as a sequence of independent members of about
+    member_mb of uncompressed lines each, and indexes it.
+    """
+    with open_file(infile, 'r') as source:
+        return write_blocks(source, outfile, member_mb, level)
+
+
+def concatenate(infiles, outfile):
+    """Concatenates the files of the same codec in infiles into outfile,
+    whose members are theirs, and removes them. outfile is indexed if all of
+    them are.
+    """
+    index = new_index()
+    with open(outfile, 'wb') as destination:
+        for infile in infiles:
+            part = read_index(infile)
+            if part is None:
+                index = None
+            elif index is not None:
+                for offset, uoffset, lines in part['checkpoints']:
+                    index['checkpoints'].append([index['size'] + offset,
+                                                 index['usize'] + uoffset,
+                                                 index['lines'] + lines])
+                index['size'] += part['size']
+                index['usize'] += part['usize']
+                index['lines'] += part['lines']
+            with open(infile, 'rb') as source:
+                while True:
+                    data = source.read(CHUNK_SIZE)
+                    if not data:
+                        break
+                    destination.write(data)
+            remove(infile)
+
+    if index is not None:
+        write_index(outfile, index)
+    return index
+
+
+def count_lines(path):
+    """Returns the number of lines of path from its index, None without one.
+    """
+    index = read_index(path)
+    if index is None:
+        return None
+    return index['lines']
+
+
+def _open_at_checkpoint(path, index, checkpoint):
+    """Returns a file object with the decompressed data of path from
+    checkpoint on.
+    """
+    codec = get_codec(path)
+    offset = index['checkpoints'][checkpoint][0]
+    source = open(path, 'rb')
+    source.seek(offset)
+    return codec.reader(RangeFile(source, index['size'] - offset))
+
+
+def open_at_line(path, line):
+    """Returns a file object for the lines of path from line (0 based) on.
+
+    Raises:
+        ValueError if path does not have an index
+    """
+    index = read_index(path)
+    if index is None:
+        raise ValueError('%s has no index' % path)
+
+    lines = [checkpoint[2] for checkpoint in index['checkpoints']]
+    checkpoint = max(0, bisect.bisect_right(lines, line) - 1)
+    reader = _open_at_checkpoint(path, index, checkpoint)
+    for _ in range(line - index['checkpoints'][checkpoint][2]):
+        if not reader.readline():
+            break
+    return reader
+
+
+def open_at_offset(path, offset):
+    """Returns a file object for the uncompressed data of path from offset on.
+
+    Raises:
+        ValueError if path does not have an index
+    """
+    index = read_index(path)
+    if index is None:
+        raise ValueError('%s has no index' % path)
+
+    offsets = [checkpoint[1] for checkpoint in index['checkpoints']]
+    checkpoint = max(0, bisect.bisect_right(offsets, offset) - 1)
+    reader = _open_at_checkpoint(path, index, checkpoint)
+    skip = offset - index['checkpoints'][checkpoint][1]
+    while skip > 0:
+        data = reader.read(min(skip, CHUNK_SIZE))
+        if not data:
+            break
+        skip -= len(data)
+    return reader
+
+
+def main():
+    """ main """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('input_files', help='input files comma seperated')
+    parser.add_argument('-m', '--checkpoint_mb', type=int, default=16,
+                        help='uncompressed MB between checkpoints')
+    parser.add_argument('-r', '--reblock',
+                        help='output files comma seperated, rewrites the \
+                              inputs as members of checkpoint_mb MB')
+    args = parser.parse_args()
+
+    infiles = args.input_files.split(',')
+    if args.reblock:
+        outfiles = args.reblock.split(',')
+        if not len(infiles) == len(outfiles):
+            print('input and output files are different sizes')
+            sys.exit(0)
+        for infile, outfile in zip(infiles, outfiles):
+            index = reblock(infile, outfile, args.checkpoint_mb)
+            print('%s: %d lines, %d checkpoints' %
+                  (outfile, index['lines'], len(index['checkpoints'])))
+        return
+
+    for infile in infiles:
+        index = build_index(infile, args.checkpoint_mb)
+        print('%s: %d lines, %d checkpoints' %
+              (infile, index['lines'], len(index['checkpoints'])))
+        if index['size'] > 2 * args.checkpoint_mb * 1024 * 1024 and \
+                len(index['checkpoints']) == 1:
+            print('%s is a single member, use --reblock for random access'
+                  % infile)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Bounded least recently used cache.
+
+Tweets repeat a lot (retweets, spam, bots), so stages that do expensive work
+on a tweet's text keep the results of the texts seen most recently.
+"""
+
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """Maps keys to values, dropping the least recently used entry when it
+    holds maxsize of them.
+
+    Attributes:
+        maxsize: int
+            maximum number of entries
+        entries: OrderedDict
+            the entries, least recently used first
+        hits: int
+            number of lookups that found their key
+        misses: int
+            number of lookups that did not
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        """Returns the value of key, or default if it is not cached."""
+        try:
+            value = self.entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        # most recently used go to the end
+        self.entries[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Caches value for key."""
+        if key in self.entries:
+            del self.entries[key]
+        elif len(self.entries) >= self.maxsize:
+            self.entries.popitem(last=False)
+        self.entries[key] = value
+
+    def stats(self):
+        """Returns a summary of the hits and misses."""
+        lookups = self.hits + self.misses
+        rate = 100.0 * self.hits / lookups if lookups else 0.0
+        return '%d hits, %d misses (%.1f%%), %d entries' % (
+            self.hits, self.misses, rate, len(self.entries))
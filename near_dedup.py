@@ -0,0 +1,300 @@
+"""Removes near duplicate lines from the generated datasets (e.g. pos.txt).
+
+Bot tweets made from a template differ from each other only by a number, an
+url or a name, so they survive the exact dedups and fill a class with
+copies of a few texts. Here the lines are compared by the Jaccard similarity
+of their sets of shingles, runs of shingle_size consecutive tokens, and only
+the first of each group of similar lines is kept.
+
+The similarity is estimated with MinHash: every shingle is hashed to 32 bits
+and then by num_perm universal hash functions, (a * x + b) mod PRIME, and
+the signature of a line is the minimum of each function over its shingles.
+The fraction of equal signature entries of two lines estimates their
+similarity. Hashing is done with numpy over all the shingles of a chunk of
+lines at once, files are streamed and only their signatures are kept.
+
+Candidate pairs come from an LSH index: signatures are cut into bands and
+lines with an identical band share a bucket. Lines that reach the threshold
+are rarely missed, and only lines in the same bucket are compared, with the
+first line of the bucket, so the cost grows about linearly with the number
+of lines. Similar lines are then grouped with a union-find.
+"""
+
+from __future__ import print_function
+import os
+import zlib
+import argparse
+from itertools import islice, izip
+
+import numpy as np
+
+from compression import open_file, get_codec
+import ldindex
+
+# largest prime below 2 ** 32, the universal hashes are taken modulo it
+PRIME = 4294967291
+# combines the hashes of the tokens of a shingle
+SHINGLE_BASE = 1000003
+# signature entries computed at once, bounds memory
+MAX_CELLS = 1 << 22
+# lines hashed at once by near_dedup_file
+CHUNK_LINES = 100000
+
+
+def token_hashes(lines):
+    """Returns the 32 bit hashes of the tokens of lines, concatenated, and
+    the number of tokens of each line.
+    """
+    hashes = []
+    lengths = np.zeros(len(lines), dtype=np.int64)
+    for i, line in enumerate(lines):
+        tokens = line.split()
+        lengths[i] = len(tokens)
+        hashes.extend(zlib.crc32(token) & 0xffffffff for token in tokens)
+    return np.array(hashes, dtype=np.uint64), lengths
+
+
+def shingle_hashes(hashes, lengths, shingle_size):
+    """Returns the hashes of the shingles of each line, concatenated, and
+    where those of each line start.
+
+    A line shorter than shingle_size is a single shingle, an empty line
+    hashes to 0.
+
+    Args:
+        hashes: numpy array
+            token hashes, as returned by token_hashes
+        lengths: numpy array
+            number of tokens of each line
+        shingle_size: int
+            number of tokens of a shingle
+    """
+    starts = np.zeros(len(lengths), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=starts[1:])
+    # position of each token in its line and tokens left after it
+    line_of = np.repeat(np.arange(len(lengths)), lengths)
+    position = np.arange(len(hashes)) - starts[line_of]
+    remaining = lengths[line_of] - position
+
+    # a shingle starts at every token followed by enough of them, and at the
+    # first token of short lines
+    first = shingle_size - 1
+    padded = np.concatenate([hashes, np.zeros(first, dtype=np.uint64)])
+    shingles = hashes.copy()
+    for offset in range(1, shingle_size):
+        following = np.where(remaining > offset,
+                             padded[offset:offset + len(hashes)], 0)
+        shingles = (shingles * SHINGLE_BASE + following) % PRIME
+    is_start = (remaining >= shingle_size) | \
+        ((position == 0) & (lengths[line_of] < shingle_size))
+
+    counts = np.maximum(lengths - first, 0)
+    counts[lengths < shingle_size] = 1
+    counts[lengths == 0] = 1
+    # empty lines get a shingle of their own
+    result = np.zeros(counts.sum(), dtype=np.uint64)
+    offsets = np.zeros(len(lengths), dtype=np.int64)
+    np.cumsum(counts[:-1], out=offsets[1:])
+    nonempty = np.repeat(lengths > 0, counts)
+    result[nonempty] = shingles[is_start]
+    return result, offsets
+
+
+def minhash(shingles, offsets, num_perm=64, seed=1):
+    """Returns the MinHash signatures of the lines, a (lines, num_perm)
+    array of 32 bit hashes.
+
+    Args:
+        shingles, offsets: numpy arrays
+            as returned by shingle_hashes
+        num_perm: int
+            number of hash functions
+        seed: int
+            seed of the hash functions, signatures are only comparable if
+            they are made with the same one
+    """
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, PRIME, size=num_perm).astype(np.uint64)[:, None]
+    b = rng.randint(0, PRIME, size=num_perm).astype(np.uint64)[:, None]
+    ends = np.append(offsets[1:], len(shingles))
+    signatures = np.zeros((len(offsets), num_perm), dtype=np.uint32)
+
+    # lines whose shingles fit in MAX_CELLS entries are hashed together,
+    # a < 2 ** 32 and x < 2 ** 32 so (a * x + b) does not overflow
+    step = max(1, MAX_CELLS // num_perm)
+    line = 0
+    while line < len(offsets):
+        last = np.searchsorted(ends, offsets[line] + step, side='right')
+        last = max(last, line + 1)
+        start, end = offsets[line], ends[last - 1]
+        values = (a * shingles[start:end][None, :] + b) % PRIME
+        signatures[line:last] = np.minimum.reduceat(
+            values, offsets[line:last] - start, axis=1).T
+        line = last
+    return signatures
+
+
+def lsh_bands(num_perm, threshold):
+    """Returns the (bands, rows) that split num_perm signature entries so
+    that lines with a similarity of about threshold or more share a band.
+
+    Two lines with similarity s share at least one of b bands of r rows with
+    probability 1 - (1 - s ** r) ** b, whose steepest point is near
+    (1 / b) ** (1 / r).
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        # below the threshold is preferred, fewer pairs are missed
+        if (1.0 / bands) ** (1.0 / rows) > threshold:
+            error *= 2
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+def find(parent, i):
+    """ Returns the root of i in the union-find forest parent """
+    root = i
+    while parent[root] != root:
+        root = parent[root]
+    while parent[i] != root:
+        parent[i], i = root, parent[i]
+    return root
+
+
+def near_duplicates(signatures, threshold, bands=None, rows=None):
+    """Returns a boolean array that is True for the lines to keep: the first
+    line of each group of lines with an estimated similarity of threshold or
+    more.
+
+    Args:
+        signatures: numpy array
+            MinHash signatures of the lines
+        threshold: float
+            Jaccard similarity above which lines are near duplicates
+        bands, rows: int
+            LSH bands, by default chosen by lsh_bands
+    """
+    num_lines, num_perm = signatures.shape
+    if bands is None or rows is None:
+        bands, rows = lsh_bands(num_perm, threshold)
+    parent = range(num_lines)
+    for band in range(bands):
+        columns = np.ascontiguousarray(
+            signatures[:, band * rows:(band + 1) * rows])
+        keys = columns.view(np.dtype((np.void, columns.shape[1] *
+                                      columns.itemsize))).ravel()
+        _, buckets = np.unique(keys, return_inverse=True)
+        # lines of each bucket with more than one, in file order
+        order = np.argsort(buckets, kind='mergesort')
+        order = order[np.bincount(buckets)[buckets[order]] > 1]
+        bounds = np.flatnonzero(np.diff(buckets[order])) + 1
+        for members in np.split(order, bounds):
+            if len(members) < 2:
+                continue
+            first = members[0]
+            others = members[1:]
+            similarity = (signatures[others] ==
+                          signatures[first]).mean(axis=1)
+            for other in others[similarity >= threshold]:
+                first_root = find(parent, first)
+                other_root = find(parent, other)
+                # the earliest line of a group is its root
+                if first_root < other_root:
+                    parent[other_root] = first_root
+                elif other_root < first_root:
+                    parent[first_root] = other_root
+
+    return np.array([find(parent, i) == i for i in range(num_lines)],
+                    dtype=bool)
+
+
+def signatures_of(lines, shingle_size=2, num_perm=64, seed=1):
+    """ Returns the MinHash signatures of lines, see minhash """
+    hashes, lengths = token_hashes(lines)
+    shingles, offsets = shingle_hashes(hashes, lengths, shingle_size)
+    return minhash(shingles, offsets, num_perm, seed)
+
+
+def near_dedup_lines(lines, threshold=0.6, shingle_size=2, num_perm=64,
+                     seed=1):
+    """ Returns the boolean array of the lines to keep, see near_duplicates
+    """
+    if not lines:
+        return np.zeros(0, dtype=bool)
+    signatures = signatures_of(lines, shingle_size, num_perm, seed)
+    return near_duplicates(signatures, threshold)
+
+
+def chunks(source, chunk_lines=CHUNK_LINES):
+    """ Yields lists of up to chunk_lines lines of source """
+    while True:
+        chunk = list(islice(source, chunk_lines))
+        if not chunk:
+            return
+        yield chunk
+
+
+def near_dedup_file(path, threshold=0.6, shingle_size=2, num_perm=64,
+                    seed=1, chunk_lines=CHUNK_LINES):
+    """Removes the near duplicate lines of path, rewriting it.
+
+    The file is read twice, in chunks of chunk_lines lines: the first pass
+    computes the signatures, the only thing kept in memory (num_perm * 4
+    bytes per line), the second writes the lines kept to a temporary file
+    that then replaces path. path is written without an index.
+
+    Returns:
+        number of lines removed
+    """
+    with open_file(path, 'r') as source:
+        signatures = [signatures_of(chunk, shingle_size, num_perm, seed)
+                      for chunk in chunks(source, chunk_lines)]
+    if not signatures:
+        return 0
+    keep = near_duplicates(np.concatenate(signatures), threshold)
+    if keep.all():
+        return 0
+
+    codec = get_codec(path)
+    temp_path = path + '.tmp'
+    try:
+        with open_file(path, 'r') as source, \
+                open_file(temp_path, 'w', codec.name) as destination:
+            for line, kept in izip(source, keep):
+                if kept:
+                    destination.write(line)
+        os.rename(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    # the lines moved, an old index would be wrong
+    if os.path.exists(ldindex.index_path(path)):
+        os.remove(ldindex.index_path(path))
+    return int(len(keep) - keep.sum())
+
+
+def main():
+    """ main """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', help='files comma seperated, rewritten')
+    parser.add_argument('-t', '--threshold', type=float, default=0.6,
+                        help='Jaccard similarity of near duplicates')
+    parser.add_argument('-k', '--shingle_size', type=int, default=2,
+                        help='tokens per shingle')
+    parser.add_argument('-p', '--num_perm', type=int, default=64,
+                        help='MinHash hash functions')
+    args = parser.parse_args()
+
+    for path in args.files.split(','):
+        removed = near_dedup_file(path, args.threshold, args.shingle_size,
+                                  args.num_perm)
+        print('%s: %d near duplicates removed' % (path, removed))
+
+
+if __name__ == '__main__':
+    main()
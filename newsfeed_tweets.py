@@ -6,13 +6,13 @@
 
 Reads a directory of directories (recursive) containing tweets in the
 newsfeed pickled/gzipped format. Outputs Line Delimited JSON containing 'text',
-'lang', 'entities', 'id_str' and created_at. Also replaces newlines in
-the tweet text and strips()s them
+'lang', 'entities', 'id', created_at and, for retweets, 'retweet_id'. Also
+replaces newlines in the tweet text and strips()s them
 """
 
 from __future__ import print_function
 import os
-import gzip
+import zlib
 import cPickle as pickle
 import json
 from multiprocessing import Pool, cpu_count
@@ -20,74 +20,120 @@ from functools import partial
 import shutil
 import argparse
 
+from compression import open_file
 
-def load_tweets(file_path, open_function=open, dest_path=None):
-    """Reads a newsfeed.ijs.si gzipped pickle tweet archive.
 
-    Tweet includes text, lang, entities, created_at and tweet id.
+# bytes read from an archive at once
+CHUNK_SIZE = 1024 * 1024
 
-    Args:
-        file_path: string which represents the file path.
 
-    Returns:
-        A list of dictionaries
+def read_records(source, chunk_size=CHUNK_SIZE):
+    """Yields the NUL terminated pickles of source unpickled, reading it a
+    chunk at a time. Records that can not be unpickled are skipped.
     """
+    rest = ''
+    while True:
+        data = source.read(chunk_size)
+        if not data:
+            break
+        records = (rest + data).split('\x00')
+        # the last one is not terminated yet
+        rest = records.pop()
+        for record in records:
+            try:
+                yield pickle.loads(record)
+            except:
+                continue
+
+
+def slim_tweet(record):
+    """Returns the tweet of a newsfeed record with only the properties used
+    later, or None if it has no text or lacks one of them.
 
-    try:
-        with open_function(file_path, 'r') as tweet_f:
-            tweets = map(pickle.loads, tweet_f.read().split('\x00')[:-1])
-
-            # conver json string to dict
-            tweets = [json.loads(x[u'raw_json'])
-                      for x in tweets if u'raw_json' in x]
+    Args:
+        record: dictionary
+            unpickled record, the tweet is in its raw_json
 
-            # check properties
-            tweets = [x for x in tweets if u'lang' in x and u'text' in x and
-                      u'retweeted_status' not in x]
-            rtweets = [x for x in tweets if u'lang' in x and u'text' in x and
-                      u'retweeted_status' in x]
+    Returns: A dictionary
+    """
+    if u'raw_json' not in record:
+        return None
+    try:
+        tweet = json.loads(record[u'raw_json'])
+    except:
+        return None
 
-            # remove other properties for the sake of disk space
-            tweets = [{u'text': t['text'], u'lang': t['lang'],
-                       u'created_at': t['created_at'],
-                       u'entities': t['entities'], u'id': t['id_str']}
-                      for t in tweets]
+    # check properties
+    for key in [u'lang', u'text', u'created_at', u'entities', u'id_str']:
+        if key not in tweet:
+            return None
 
-            rtweets = [{u'text': t['text'], u'lang': t['lang'],
-                        u'created_at': t['created_at'],
-                        u'entities': t['entities'], u'id': t['id_str'],
-                        u'retweet_id': t['retweeted_status'['id_str']]}
-                       for t in rtweets]
+    # remove newlines, strip from text
+    text = tweet['text'].replace(u'\n', u' ').strip()
+    # make sure there are no empty tweets
+    if not text:
+        return None
 
-            tweets += rtweets
+    # remove other properties for the sake of disk space
+    slim = {u'text': text, u'lang': tweet['lang'],
+            u'created_at': tweet['created_at'],
+            u'entities': tweet['entities'], u'id': int(tweet['id_str'])}
+    if u'retweeted_status' in tweet:
+        if u'id_str' not in tweet['retweeted_status']:
+            return None
+        slim[u'retweet_id'] = int(tweet['retweeted_status']['id_str'])
+    return slim
 
-            # remove newlines, strip from text
-            for tweet in tweets:
-                tweet['text'] = tweet['text'].replace(u'\n', u' ').strip()
 
-            # make sure there are no empty tweets
-            tweets = [x for x in tweets if x['text']]
+def load_tweets(file_path, open_function=open, dest_path=None,
+                chunk_size=CHUNK_SIZE):
+    """Reads a newsfeed.ijs.si gzipped pickle tweet archive and writes its
+    tweets as Line Delimited JSON to a file of the same name in dest_path.
 
-        if not tweets:
-            return
+    Tweet includes text, lang, entities, created_at, tweet id and the id of
+    the retweeted tweet. The archive is read and written one tweet at a
+    time, to a temporary file that only replaces the output once the whole
+    archive is converted, so a failed or repeated conversion leaves no
+    partial or duplicate tweets.
 
-    except:
-        print('Failed to read %s' % file_path)
-        return None
+    Args:
+        file_path: string which represents the file path.
+        chunk_size: bytes read from the archive at once
 
-    # write new file
+    Returns:
+        The number of tweets written or None if the archive can not be read
+    """
     write_file = os.path.basename(file_path)
     write_file = write_file.split('.')[0] + '.json.gz'
     write_file = os.path.join(dest_path, write_file)
+    temp_file = write_file + '.tmp'
 
+    destination = None
+    count = 0
     try:
-        with gzip.open(write_file, 'wa') as destination:
-            for tweet in tweets:
-                tweet_string = json.dumps(tweet) + '\n'
-                destination.write(tweet_string)
-    except:
-        print('Failed to write %s' % write_file)
-    return None
+        with open_function(file_path, 'rb') as tweet_f:
+            for record in read_records(tweet_f, chunk_size):
+                tweet = slim_tweet(record)
+                if tweet is None:
+                    continue
+                # written only if the archive has tweets
+                if destination is None:
+                    destination = open_file(temp_file, 'w', 'gzip')
+                destination.write(json.dumps(tweet) + '\n')
+                count += 1
+        if destination is not None:
+            destination.close()
+            os.rename(temp_file, write_file)
+    except (IOError, EOFError, zlib.error):
+        print('Failed to convert %s' % file_path)
+        return None
+    finally:
+        if destination is not None:
+            destination.close()
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+    return count
 
 
 def convert_tweets(read_dir, dest_path, filename):
@@ -107,8 +153,8 @@ def convert_tweets(read_dir, dest_path, filename):
     """
 
     n_processed = 0
-    pool = Pool(cpu_count() - 2)
-    func_gz = partial(load_tweets, open_function=gzip.open,
+    pool = Pool(max(1, cpu_count() - 2))
+    func_gz = partial(load_tweets, open_function=open_file,
                       dest_path=dest_path)
     func_pi = partial(load_tweets, open_function=open, dest_path=dest_path)
 
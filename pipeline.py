@@ -0,0 +1,242 @@
+"""Chains tweet processing stages so they can run in a single pass.
+
+Every stage function takes a tweet, either as a Line Delimited JSON string or
+as an already parsed dictionary, and returns a dictionary or None to drop the
+tweet. Chaining them lets a single MultiprocessFiles run apply all the stages
+to an in-memory dictionary and serialize only the tweets that survive.
+
+Stages that look at the words of a tweet get its TextAnalysis through
+analyze_tweet, which attaches it to the tweet (see AnalyzedTweet). The next
+stage of a chain gets the same tweet object, so the text is only split once.
+
+A stage can also have a batch version, registered with register_batch_stage,
+that processes a list of tweets at once. apply_stages_batch and
+apply_routed_batch use it to run a chain over a whole batch of lines.
+"""
+
+import json
+from functools import partial
+
+
+def load_tweet(line):
+    """Returns the tweet in line as a dictionary.
+
+    Args:
+        line: string or dictionary
+            LD-JSON line or tweet already parsed by a previous stage
+
+    Returns: A dictionary
+    """
+    if isinstance(line, dict):
+        return line
+    return json.loads(line)
+
+
+def apply_stages(stages, line):
+    """Applies each stage in stages to line, stopping at the first None.
+
+    Args:
+        stages: list of functions
+            stage functions in the order they should be applied
+        line: string or dictionary
+            tweet to be processed
+
+    Returns:
+        the tweet returned by the last stage or None if it was filtered out
+    """
+    tweet = line
+    for stage in stages:
+        tweet = stage(tweet)
+        if tweet is None:
+            return None
+    return tweet
+
+
+def apply_routed(route, chains, line):
+    """Routes line to an output and applies that output's chain of stages.
+
+    Args:
+        route: function
+            returns an (output name, tweet) pair or None for a tweet
+        chains: dictionary
+            maps output names to lists of stage functions
+        line: string or dictionary
+            tweet to be processed
+
+    Returns:
+        an (output name, tweet) pair or None if the tweet was filtered out
+    """
+    routed = route(line)
+    if routed is None:
+        return None
+
+    name, tweet = routed
+    tweet = apply_stages(chains[name], tweet)
+    if tweet is None:
+        return None
+
+    return (name, tweet)
+
+
+# batch version of each stage function that has one
+BATCH_STAGES = {}
+
+
+def register_batch_stage(func, batch_func):
+    """Registers batch_func as the batch version of the stage func.
+
+    batch_func takes the same arguments as func except for a list of tweets
+    instead of a single one, and returns a list with a tweet or None for
+    each of them.
+    """
+    BATCH_STAGES[func] = batch_func
+
+
+def batch_stage(stage):
+    """Returns the batch version of stage, a function or a partial of one,
+    or None if it does not have one.
+    """
+    if isinstance(stage, partial) and stage.func in BATCH_STAGES:
+        return partial(BATCH_STAGES[stage.func], *stage.args,
+                       **(stage.keywords or {}))
+    if stage in BATCH_STAGES:
+        return BATCH_STAGES[stage]
+    return None
+
+
+def apply_stages_batch(stages, lines):
+    """Applies stages to each of lines like apply_stages, one stage at a
+    time over the whole list so that stages with a batch version use it.
+    Tweets dropped by a stage are not passed to the next ones.
+
+    Returns:
+        list with the tweet or None for each of lines
+    """
+    results = list(lines)
+    alive = range(len(results))
+    for stage in stages:
+        if not alive:
+            break
+        batch = batch_stage(stage)
+        if batch is None:
+            for i in alive:
+                results[i] = stage(results[i])
+        else:
+            tweets = batch([results[i] for i in alive])
+            for i, tweet in zip(alive, tweets):
+                results[i] = tweet
+        alive = [i for i in alive if results[i] is not None]
+
+    return results
+
+
+def apply_routed_batch(route, chains, lines):
+    """Routes each of lines and applies its output's chain of stages, like
+    apply_routed, batching the lines of each output.
+
+    Returns:
+        list with an (output name, tweet) pair or None for each of lines
+    """
+    results = [None] * len(lines)
+    routed = {}
+    for i, line in enumerate(lines):
+        pair = route(line)
+        if pair is not None:
+            routed.setdefault(pair[0], []).append((i, pair[1]))
+
+    for name, items in routed.items():
+        tweets = apply_stages_batch(chains[name], [tweet for _, tweet in items])
+        for (i, _), tweet in zip(items, tweets):
+            if tweet is not None:
+                results[i] = (name, tweet)
+    return results
+
+
+class TextAnalysis(object):
+    """Words of a tweet's text used to filter and classify it.
+
+    Attributes:
+        text: unicode
+            the analysed text
+        replacement_set: frozenset
+            replacement values left out of the tokens
+        tokens: list
+            alphabetic tokens of text that are not replacements (e.g. the
+            user token) nor 'rt'
+    """
+
+    def __init__(self, text, replacement_set):
+        self.text = text
+        self.replacement_set = replacement_set
+        self.tokens = [x for x in text.split() if x not in replacement_set
+                       and x.isalpha() and x.lower() != u'rt']
+        self._joined = None
+
+    @property
+    def count(self):
+        """ Number of tokens """
+        return len(self.tokens)
+
+    @property
+    def joined(self):
+        """ The tokens separated by spaces """
+        if self._joined is None:
+            self._joined = u' '.join(self.tokens)
+        return self._joined
+
+
+class AnalyzedTweet(dict):
+    """A tweet dictionary that carries the TextAnalysis of its text.
+
+    The analysis is an attribute, not a key, so it is not serialized with
+    the tweet and is lost when a stage builds a new dictionary.
+
+    Attributes:
+        analysis: TextAnalysis
+            analysis of the tweet's text when it was attached
+    """
+
+    def __init__(self, tweet, analysis):
+        dict.__init__(self, tweet)
+        self.analysis = analysis
+
+
+# replacement values of each replacements dictionary, the dictionary is kept
+# so that its id is not reused
+_replacement_sets = {}
+
+
+def replacement_set(replacements):
+    """Returns the set of replacement values of replacements, which are
+    expected not to change.
+    """
+    key = id(replacements)
+    if key not in _replacement_sets:
+        _replacement_sets[key] = (replacements,
+                                  frozenset(replacements.values()))
+    return _replacement_sets[key][1]
+
+
+def analyze_tweet(tweet, replacements):
+    """Returns the tweet with the TextAnalysis of its text attached and the
+    analysis. The analysis a previous stage attached is reused if the text
+    and the replacements have not changed since.
+
+    Args:
+        tweet: dictionary
+            parsed tweet
+        replacements: dictionary
+            entities replacements, their values are not words
+
+    Returns:
+        an (AnalyzedTweet, TextAnalysis) pair
+    """
+    replacement_values = replacement_set(replacements)
+    analysis = getattr(tweet, 'analysis', None)
+    if analysis is not None and \
+            analysis.replacement_set is replacement_values and \
+            analysis.text == tweet['text']:
+        return tweet, analysis
+
+    analysis = TextAnalysis(tweet['text'], replacement_values)
+    return AnalyzedTweet(tweet, analysis), analysis
@@ -11,41 +11,95 @@ import sys
 from functools import partial
 
 from MultiprocessFiles import MultiprocessFiles
+from pipeline import load_tweet, analyze_tweet
 
 
-def update_indices(list_of_indices, delta, start_index):
-    """Updates indices in list by delta"""
-    if list_of_indices is None:
-        return
-
-    for element in list_of_indices:
-        if element[0] < start_index:
-            continue
-        element[0] += delta
-        element[1] += delta
+# (entities field, replacement) in the order the entities are replaced,
+# media are replaced like urls
+ENTITIES = [('user_mentions', 'user'), ('urls', 'url'),
+            ('hashtags', 'hashtag'), ('symbols', 'symbol'), ('media', 'url')]
 
 
-def replace_entity(entity, tweet, indices_list, list1, list2, list3, list4,
-                   replacements):
-    """Replaces entity in tweet based on indices_list
+def replace_sequential(text, spans):
+    """Replaces spans of text one after the other, shifting the spans that
+    start at or after each replacement.
 
-    Other lists are just updated so they correspond with new processed text.
+    Handles overlapping spans, see replace_spans.
+    """
+    spans = [list(span) for span in spans]
+    for i, (start, end, replacement) in enumerate(spans):
+        if end > 140:
+            return None
+        text = text[:start] + replacement + text[end:]
+        delta = len(replacement) - (end - start)
+        for span in spans[i + 1:]:
+            if span[0] >= start:
+                span[0] += delta
+                span[1] += delta
+    return text
+
+
+def replace_spans(text, spans):
+    """Replaces [start, end) spans of text in a single join.
+
+    The tweet is rejected if, in the text as it is when a span would be
+    replaced, the span ends after character 140. Spans are replaced in the
+    order given, overlapping ones are left to replace_sequential.
+
+    Args:
+        text: unicode
+            the text
+        spans: list of tuples
+            (start, end, replacement) in the order of replacement
+
+    Returns:
+        the new text or None if the tweet is rejected
     """
-    for index_list in indices_list:
-        if index_list[1] > 140:
+    ordered = sorted(spans)
+    position = 0
+    for start, end, _ in ordered:
+        if start < position or end < start:
+            return replace_sequential(text, spans)
+        # spans starting at the same place shift each other
+        position = max(end, start + 1)
+    if ordered and ordered[-1][1] > len(text):
+        return replace_sequential(text, spans)
+
+    # when a span is replaced it has been shifted by the spans replaced
+    # before it that start before it. Summing the growth and the shrinking
+    # of all the spans before it bounds that shift
+    parts = []
+    position = 0
+    grown = 0
+    shrunk = 0
+    undecided = False
+    for start, end, replacement in ordered:
+        if end + shrunk > 140:
             return None
-        entity_length = index_list[1] - index_list[0]
-        replacement_word_length = len(replacements[entity])
-        tweet['text'] = (tweet['text'][:index_list[0]] + replacements[entity] +
-                         tweet['text'][index_list[1]:])
-        delta = replacement_word_length - entity_length
-        update_indices(list1, delta, index_list[0])
-        update_indices(list2, delta, index_list[0])
-        update_indices(list3, delta, index_list[0])
-        update_indices(list4, delta, index_list[0])
-        update_indices(indices_list, delta, index_list[0])
-    
-    return True
+        if end + grown > 140:
+            undecided = True
+        delta = len(replacement) - (end - start)
+        if delta > 0:
+            grown += delta
+        else:
+            shrunk += delta
+        parts.append(text[position:start])
+        parts.append(replacement)
+        position = end
+    parts.append(text[position:])
+
+    if undecided:
+        replaced = []
+        for start, end, replacement in spans:
+            shift = 0
+            for other_start, delta in replaced:
+                if other_start < start:
+                    shift += delta
+            if end + shift > 140:
+                return None
+            replaced.append((start, len(replacement) - (end - start)))
+
+    return u''.join(parts)
 
 
 def replace_entities(tweet, replacements):
@@ -53,103 +107,20 @@ def replace_entities(tweet, replacements):
     if 'entities' not in tweet:
         return tweet
 
-    if 'user_mentions' in tweet['entities']:
-        list_of_users = tweet['entities']['user_mentions']
-    else:
-        list_of_users = None
-
-    if 'urls' in tweet['entities']:
-        list_of_urls = tweet['entities']['urls']
-    else:
-        list_of_urls = None
-
-    if 'hashtags' in tweet['entities']:
-        list_of_hashtags = tweet['entities']['hashtags']
-    else:
-        list_of_hashtags = None
-
-    if 'symbols' in tweet['entities']:
-        list_of_symbols = tweet['entities']['symbols']
-    else:
-        list_of_symbols = None
-
-    if 'media' in tweet['entities']:
-        list_of_media = tweet['entities']['media']
-    else:
-        list_of_media = None
-
-    # update indices when replacing entities and check existance
-    if list_of_users is not None:
-        list_of_users_indices = [user['indices'] for user in list_of_users]
-    else:
-        list_of_users_indices = None
-
-    if list_of_urls is not None:
-        list_of_urls_indices = [url['indices'] for url in list_of_urls]
-    else:
-        list_of_urls_indices = None
-
-    if list_of_hashtags is not None:
-        list_of_hashtags_indices = [hashtag['indices'] for hashtag in
-                                    list_of_hashtags]
-    else:
-        list_of_hashtags_indices = None
-
-    if list_of_symbols is not None:
-        list_of_symbols_indices = [symbol['indices'] for symbol in
-                                   list_of_symbols]
-    else:
-        list_of_symbols_indices = None
-
-    if list_of_media is not None:
-        list_of_media_indices = [media['indices'] for media in list_of_media]
-    else:
-        list_of_media_indices = None
-
-    if list_of_users_indices is not None and replacements['user'] is not None:
-        ret = replace_entity('user', tweet, list_of_users_indices,
-                             list_of_urls_indices, list_of_hashtags_indices,
-                             list_of_symbols_indices, list_of_media_indices,
-                             replacements)
-        if not ret:
-            return None
-
-    if list_of_urls_indices is not None and replacements['url'] is not None:
-        ret = replace_entity('url', tweet, list_of_urls_indices,
-                             list_of_users_indices, list_of_hashtags_indices,
-                             list_of_symbols_indices, list_of_media_indices,
-                             replacements)
-        if not ret:
-            return None
-
-    if (list_of_hashtags_indices is not None and
-            replacements['hashtag'] is not None):
-        ret = replace_entity('hashtag', tweet, list_of_hashtags_indices,
-                             list_of_users_indices, list_of_urls_indices,
-                             list_of_symbols_indices, list_of_media_indices,
-                             replacements)
-        if not ret:
-            return None
-
-    if (list_of_symbols_indices is not None and
-            replacements['symbol'] is not None):
-        ret = replace_entity('symbol', tweet, list_of_symbols_indices,
-                             list_of_users_indices, list_of_urls_indices,
-                             list_of_hashtags_indices, list_of_media_indices,
-                             replacements)
-        if not ret:
-            return None
+    spans = []
+    for field, entity in ENTITIES:
+        if field not in tweet['entities'] or replacements[entity] is None:
+            continue
+        for item in tweet['entities'][field]:
+            start, end = item['indices'][:2]
+            spans.append((start, end, replacements[entity]))
 
-    if list_of_media_indices is not None and replacements['url'] is not None:
-        ret = replace_entity('url', tweet, list_of_media_indices,
-                             list_of_symbols_indices, list_of_users_indices,
-                             list_of_urls_indices, list_of_hashtags_indices,
-                             replacements)
-        if not ret:
-            return None
+    text = replace_spans(tweet['text'], spans)
+    if text is None:
+        return None
 
     # remove field entities
-    ntweet = {u'text': tweet['text'], u'lang': tweet['lang'],
+    ntweet = {u'text': text, u'lang': tweet['lang'],
               u'id': tweet['id']}
     if 'created_at' in tweet:
         ntweet['created_at'] = tweet['created_at']
@@ -163,7 +134,7 @@ def preprocess_tweet(min_tokens, max_num_urls, max_num_users, replacements,
                      tweet_line):
     """ Preprocess a single tweet """
     try:
-        tweet = json.loads(tweet_line)
+        tweet = load_tweet(tweet_line)
     except:
         return None
 
@@ -181,13 +152,9 @@ def preprocess_tweet(min_tokens, max_num_urls, max_num_users, replacements,
         # print('tweet je none')
         return None
 
-    # filter based on num of tokens
-    tokens = tweet['text'].split()
-    list_replacements = replacements.values()
-    tokens = [x for x in tokens if x not in list_replacements and
-              x.isalpha() and x.lower() != u'rt']
-
-    if len(tokens) < min_tokens:
+    # filter based on num of tokens, the analysis is kept for langid
+    tweet, analysis = analyze_tweet(tweet, replacements)
+    if analysis.count < min_tokens:
         return None
 
     return tweet
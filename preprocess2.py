@@ -19,6 +19,7 @@ import argparse
 from functools import partial
 
 from MultiprocessFiles import MultiprocessFiles
+from pipeline import load_tweet
 
 
 # number
@@ -34,7 +35,7 @@ hash_re = re.compile(r'(\A|\s)#(\w+)', re.UNICODE)
 def preprocess2(lowercase, break_hashtags, replacements, line):
     """ returns lowered line """
     try:
-        tweet = json.loads(line)
+        tweet = load_tweet(line)
         text = tweet['text']
     except:
         tweet = dict()
@@ -1,79 +1,161 @@
 """
-Select random lines from a gzipped file and write them to another file
+Select random lines from a (compressed) file and write them to another file
 """
 
 from __future__ import print_function
 
 import sys
+import json
+import math
+import time
 import argparse
-import gzip
 import random
-from progressbar import ProgressBar, Bar, Percentage
+import itertools
 
+from compression import open_file
 
-def naive_count_lines(infile):
-    """ Count lines in a gzip JSON LD file """
-    n = 0
 
-    with gzip.open(infile, 'r') as source:
-        for _, n in enumerate(source, 1):
-            pass
-
-    return n
+class Reservoir(object):
+    """Uniform random sample of n items from a stream of unknown length.
 
+    Uses Algorithm L (Li, 1994): once the reservoir is full it draws how many
+    items to skip before the next replacement, instead of a random number
+    for every item.
+    """
 
-def buf_count_lines(filename):
+    def __init__(self, n, rng):
+        self.n = n
+        self.rng = rng
+        self.items = []
+        self.seen = 0
+        self.next = None
+        self.w = 1.0
+
+    def skip(self):
+        """Returns how many items to skip before the next replacement."""
+        # 1 - random() is in (0, 1], log is defined
+        self.w *= math.exp(math.log(1.0 - self.rng.random()) / self.n)
+        return int(math.floor(math.log(1.0 - self.rng.random()) /
+                              math.log(1.0 - self.w)))
+
+    def fill(self, items):
+        """Offers the first items of the stream at once, up to n of them."""
+        added = list(itertools.islice(items, self.n - len(self.items)))
+        self.items.extend(added)
+        self.seen += len(added)
+        if len(self.items) == self.n and self.next is None:
+            self.next = self.seen + self.skip() + 1
+
+    def to_skip(self):
+        """Returns how many of the next items would not be kept, they can be
+        skipped instead of offered, or None if the reservoir is not full.
+        """
+        if self.next is None:
+            return None
+        return self.next - self.seen - 1
+
+    def skipped(self, count):
+        """Counts count items of the stream as seen without offering them."""
+        self.seen += count
+
+    def add(self, item):
+        """Offers the next item of the stream."""
+        self.seen += 1
+        if len(self.items) < self.n:
+            self.items.append(item)
+            if len(self.items) == self.n:
+                self.next = self.seen + self.skip() + 1
+        elif self.seen == self.next:
+            self.items[self.rng.randrange(self.n)] = item
+            self.next = self.seen + self.skip() + 1
+
+
+def day_key(line):
+    """ Stratum of a tweet: the day it was created, e.g. 2015-07-04 """
+    created_at = json.loads(line)['created_at']
+    return time.strftime('%Y-%m-%d',
+                         time.strptime(created_at, '%a %b %d %H:%M:%S +0000 %Y'))
+
+
+def lang_key(line):
+    """ Stratum of a tweet: its lang field """
+    return json.loads(line)['lang']
+
+
+STRATA = {'lang': lang_key, 'day': day_key}
+
+
+def sample_lines(source, n, rng):
     """
-    Buffered count
+    Returns n random (line number, line) pairs from source in a single pass.
     """
-    f = gzip.open(filename, 'r')
-    lines = 0
-    buf_size = 1024 * 1024
-    read_f = f.read  # loop optimization
+    reservoir = Reservoir(n, rng)
+    reservoir.fill(enumerate(itertools.islice(source, n)))
 
-    buf = read_f(buf_size)
-    while buf:
-        lines += buf.count('\n')
-        buf = read_f(buf_size)
+    skip = reservoir.to_skip()
+    while skip is not None:
+        # skipped lines are consumed without returning to python
+        line = next(itertools.islice(source, skip, None), None)
+        if line is None:
+            break
+        reservoir.skipped(skip)
+        reservoir.add((reservoir.seen, line))
+        skip = reservoir.to_skip()
 
-    return lines
+    return reservoir.items
 
 
-def select_nrandom(infile, outfile, n):
+def sample_strata(source, n, rng, key):
+    """
+    Returns n random (line number, line) pairs for each stratum, key maps a
+    line to its stratum.
+    """
+    reservoirs = {}
+    for counter, line in enumerate(source):
+        try:
+            stratum = key(line)
+        except:
+            continue
+        if stratum not in reservoirs:
+            reservoirs[stratum] = Reservoir(n, rng)
+        reservoirs[stratum].add((counter, line))
+
+    selected = []
+    for stratum in sorted(reservoirs):
+        print('%s: %d of %d' % (stratum, len(reservoirs[stratum].items),
+                                reservoirs[stratum].seen))
+        selected.extend(reservoirs[stratum].items)
+    return selected
+
+
+def select_nrandom(infile, outfile, n, seed=None, stratify=None):
     """
-    Selects random lines from a file
+    Selects n random lines from a file, keeping their order. Reads the file
+    once and keeps only the selected lines in memory.
+
+    Args:
+        seed: makes the selection reproducible
+        stratify: None, 'lang' or 'day' to select n lines for each language
+            or creation day
     """
-    count_lines = buf_count_lines
-    n_lines = count_lines(infile)
-    selected_lines = sorted(random.sample(range(0, n_lines), n))
-    last_line = selected_lines[-1]
-
-    print("%s -> %s (%d [last: %d] -> %d)" % (infile, outfile, n_lines,
-                                              last_line, n))
-    pbar = ProgressBar(widgets=[Percentage(), Bar()], maxval=last_line).start()
-    counter = 0
-
-    with gzip.open(outfile, 'w') as destination:
-        with gzip.open(infile, 'r') as source:
-            for line in source:
-
-                # check if line is selected
-                if counter == selected_lines[0]:
-                    # "selected" line is written to file
-                    destination.write(line)
-                    selected_lines = selected_lines[1:]
-
-                    # update display
-                    pbar.update(counter)
-
-                # update line counter
-                counter += 1
-
-                # check end condition
-                if not selected_lines:
-                    # all "selected" lines have been written
-                    pbar.finish()
-                    break
+    if n <= 0:
+        # nothing selected, the output is still written
+        open_file(outfile, 'w').close()
+        return
+
+    rng = random.Random(seed)
+    with open_file(infile, 'r') as source:
+        if stratify is None:
+            selected = sample_lines(source, n, rng)
+        else:
+            selected = sample_strata(source, n, rng, STRATA[stratify])
+    selected.sort()
+
+    print("%s -> %s (%d)" % (infile, outfile, len(selected)))
+
+    with open_file(outfile, 'w') as destination:
+        for _, line in selected:
+            destination.write(line)
 
     return
 
@@ -86,7 +168,11 @@ def main():
     parser.add_argument('tweet_infiles', help='input files comma seperated')
     parser.add_argument('dest_files', help='output files comma seperated')
     parser.add_argument('-n', '--number', type=int,
-                        help='selects simple tokenizer instead of twokenizer')
+                        help='number of lines to select')
+    parser.add_argument('-s', '--seed', type=int,
+                        help='random seed, makes the selection reproducible')
+    parser.add_argument('--stratify', choices=sorted(STRATA),
+                        help='select n lines for each language or day')
     args = parser.parse_args()
 
     tweet_files = args.tweet_infiles.split(',')
@@ -100,7 +186,7 @@ def main():
         n = args.number
 
     for source, dest in zip(tweet_files, dest_files):
-        select_nrandom(source, dest, n)
+        select_nrandom(source, dest, n, args.seed, args.stratify)
 
 if __name__ == '__main__':
     main()
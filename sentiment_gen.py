@@ -21,32 +21,30 @@ import os
 import json
 import argparse
 from functools import partial
-import codecs
-import gzip
 import sys
 
 from newsfeed_tweets import convert_tweets
-from filter_lang import filter_line
+from filter_lang import route_line
 from preprocess import preprocess_tweet
 from preprocess2 import preprocess2
-from classify_langid import filter_classify_lang_line
-from MultiprocessFiles import MultiprocessFiles
+from classify_langid import filter_classify_lang_line, get_classifier
+from MultiprocessFiles import MultiprocessFiles, Sink
+from pipeline import apply_stages, apply_stages_batch
+from compression import get_codec
+import ldindex
 import twokenize
-from tokenize import word_tokenize, tokenize_tweet
-from filter_emoticons import process_line
-from exclude_ids import exclude_ids
-from filter_unique import make_unique
+from tokenize import word_tokenize, tokenize_tweet, memoize_tokenizer
+from filter_emoticons import label_tweets, smiley_prefilter
+from exclude_ids import exclude_route
+from dedup import partition_route, partition_sinks, dedup_partitions, \
+    dedup_file, num_partitions_for
+from idstore import IdStore
+from near_dedup import near_dedup_file
 
 
 def main():
     """ main """
     replacements = json.load(open('replacements.json'))
-    # Stats Vars
-    n_pos = 0
-    n_neg = 0
-    n = 0
-    POS = True
-    NEG = False
 
     parser = argparse.ArgumentParser()
 
@@ -57,7 +55,23 @@ def main():
     parser.add_argument('-j', '--num_jobs', default=0, type=int,
                         help='0 uses all cores available')
     parser.add_argument('-q', '--queue_size', type=int, default=2000)
+    parser.add_argument('--batch_size', type=int, default=1000,
+                        help='lines sent to the workers in each message')
+    parser.add_argument('--codec', default='gzip',
+                        help='codec of the intermediate files: plain, gzip, \
+                              zstd or lz4')
+    parser.add_argument('--compress_level', type=int, default=1,
+                        help='compression level of the intermediate files')
+    parser.add_argument('--num_writers', type=int, default=1,
+                        help='processes writing the output files of a run')
+    parser.add_argument('--ordered', action='store_true', default=False,
+                        help='keep tweets in input order within each dedup \
+                              partition, makes the output reproducible. Runs \
+                              at the pace of the slowest output file')
     parser.add_argument('output_dir')
+    parser.add_argument('--stage_files', action='store_true', default=False,
+                        help='run each stage separately, writing its output \
+                              to an intermediate file (for debugging)')
 
     # Exclude Tweets
     parser.add_argument('-e', '--exclude_ids', action='store_true',
@@ -71,6 +85,16 @@ def main():
 
     # Language Identification
     parser.add_argument('-prob', '--langid_min_prob', type=float, default=0.8)
+    parser.add_argument('--langid_candidates',
+                        help='languages langid chooses from besides the \
+                              target, comma seperated (e.g. those it is \
+                              confused with). Default: all')
+    parser.add_argument('--langid_normalize', action='store_true',
+                        default=False,
+                        help='compare langid_min_prob with a probability \
+                              over the candidates, not a raw langid score')
+    parser.add_argument('--langid_cache', type=int, default=10000,
+                        help='texts whose language each worker caches')
 
     # Tokenization
     parser.add_argument('-s', '--simple', dest='simple', action='store_true',
@@ -81,6 +105,9 @@ def main():
     parser.add_argument('-tw', '--twokenize2', dest='twokenize2',
                         action='store_true',
                         help='Break apostroph words')
+    parser.add_argument('--tokenize_cache', type=int, default=0,
+                        help='texts whose tokens each worker caches. \
+                              Default: no cache')
  
     # Preprocessing Part II
     parser.add_argument('-l', '--lowercase', dest='lowercase',
@@ -88,9 +115,31 @@ def main():
     parser.add_argument('-b', '--break_hash', dest='break_hash',
                         action='store_true', default=False)
 
+    # Filter Unique
+    parser.add_argument('--dedup_text', action='store_true', default=False,
+                        help='also drop tweets whose normalized final text \
+                              is the same as an earlier one (e.g. spam)')
+    parser.add_argument('--near_dup_threshold', type=float, default=0.0,
+                        help='remove lines of pos, neg and other.txt with \
+                              a Jaccard similarity (of token pairs) of \
+                              near_dup_threshold or more to an earlier one. \
+                              Default: 0, keep them')
+
     # Sentiment Dataset Generation
     parser.add_argument('-m', '--prob_smiley', type=float, default=0.4,
                         help='probability to keep smiley')
+    parser.add_argument('--labelled_only', action='store_true',
+                        default=False,
+                        help='drop the tweets without a smiley before \
+                              preprocessing them, other.txt gets only \
+                              other_fraction of them')
+    parser.add_argument('--other_fraction', type=float, default=0.0,
+                        help='fraction of the tweets without a smiley kept \
+                              with --labelled_only')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the decisions to keep smileys and \
+                              other tweets, they only depend on it and the \
+                              tweet id')
 
     args = parser.parse_args()
 
@@ -103,6 +152,9 @@ def main():
     max_num_urls = args.max_urls
     max_num_users = args.max_users
     langid_min_prob = args.langid_min_prob
+    langid_candidates = None
+    if args.langid_candidates:
+        langid_candidates = args.langid_candidates.split(',')
     num_jobs = args.num_jobs
     qsize = args.queue_size
     tokenize_function = twokenize.tokenize2
@@ -112,10 +164,22 @@ def main():
         tokenize_function = twokenize.tokenize
     if args.twokenize2:
         tokenize_function = twokenize.tokenize2
+    tokenize_function = memoize_tokenizer(tokenize_function,
+                                          args.tokenize_cache)
+    # the workers of the run that tokenizes report their cache when done
+    tokenize_report = getattr(tokenize_function, 'report', None)
     if args.exclude_ids and not args.ids_file:
         print('no ids file provided')
         sys.exit(0)
 
+    # options shared by every MultiprocessFiles run
+    mp_options = {'num_procs': num_jobs, 'queue_size': qsize,
+                  'batch_size': args.batch_size, 'ordered': args.ordered,
+                  'compress_level': args.compress_level,
+                  'num_writers': args.num_writers}
+    # extension of the intermediate files, it selects their codec
+    ext = '.json' + ''.join(get_codec(name=args.codec).extensions[:1])
+
     filename = os.path.basename(tweets_file)
 
     # Read newsfeed pickled tweets
@@ -124,136 +188,147 @@ def main():
         # added if tweets file argument is not correct, try if it works
         tweets_file = os.path.join(tweets_path, filename)
 
-    for lang_code in lang_codes:
-        print('Using %s as language code' % lang_code)
+    # Exclude ids
+    if args.exclude_ids:
+        # memory-mapped, shared by the workers and kept for later runs
+        idlist = IdStore.from_ids_file(args.ids_file)
 
+    print('Using %s as language codes' % ', '.join(lang_codes))
+    lang_paths = {}
+    lang_stages = {}
+    for lang_code in lang_codes:
         # new dir for each language
-        tmpdir = os.path.join(tweets_path, 'generated_tweets_' +
-                              str(lang_code))
-        if not os.path.isdir(tmpdir):
-            os.makedirs(tmpdir)
-        tweets_path = tmpdir
-
-        # Filter Based on Language
-        func = partial(filter_line, lang_code)
-        outfile = 'tweets.' + lang_code + '.json.gz'
-        outfile = os.path.join(tweets_path, outfile)
-        multiprocess_filter_lang = MultiprocessFiles(tweets_file, outfile, func,
-                                                     num_procs=num_jobs,
-                                                     queue_size=qsize)
-        multiprocess_filter_lang.run()
-
-        # Exclude ids
-        if args.exclude_ids:
-            idlist = open(args.ids_file, 'r').readlines()
-            idlist = set([int(x.strip()) for x in idlist])
-            func = partial(exclude_ids, idlist)
-
-            infile = outfile
-            outfile = 'tweets.' + lang_code + '.exc.json.gz'
-            outfile = os.path.join(tweets_path, outfile)
-            exclude = MultiprocessFiles(infile, outfile, func,
-                                        num_procs=num_jobs,
-                                        queue_size=qsize)
-            exclude.run()
-
-            os.remove(infile)
-
-        # Preprocess Text
-        input_file = outfile
-        output_file = 'tweets.' + lang_code + '.pp.json.gz'
-        output_file = os.path.join(tweets_path, output_file)
-        func = partial(preprocess_tweet, min_tokens,
-                       max_num_urls, max_num_users, replacements)
-        preprocess = MultiprocessFiles(input_file, output_file, func,
-                                       num_procs=num_jobs, queue_size=qsize)
-        preprocess.run()
-
-        os.remove(input_file)
-
-        # Lang Identification
-        infile = output_file
-        dest_file = 'tweets.' + lang_code + '.pp.lid.json.gz'
-        dest_file = os.path.join(tweets_path, dest_file)
+        lang_path = os.path.join(tweets_path, 'generated_tweets_' +
+                                 str(lang_code))
+        if not os.path.isdir(lang_path):
+            os.makedirs(lang_path)
+        lang_paths[lang_code] = lang_path
 
-        func = partial(filter_classify_lang_line, lang_code, langid_min_prob,
-                       replacements)
+        # (output file, function) for each stage after the language filter
+        stages = []
 
-        classify = MultiprocessFiles(infile, dest_file, func,
-                                     num_procs=num_jobs, queue_size=qsize)
-        classify.run()
+        # Smiley prefilter
+        if args.labelled_only:
+            stages.append(('tweets.' + lang_code + '.sm' + ext,
+                           partial(smiley_prefilter, args.other_fraction,
+                                   args.seed)))
 
-        os.remove(infile)
+        # Preprocess Text
+        stages.append(('tweets.' + lang_code + '.pp' + ext,
+                       partial(preprocess_tweet, min_tokens, max_num_urls,
+                               max_num_users, replacements)))
+
+        # Lang Identification, the model is loaded before the workers fork
+        # instead of in each of them
+        get_classifier(lang_code, langid_candidates, args.langid_normalize,
+                       args.langid_cache)
+        stages.append(('tweets.' + lang_code + '.pp.lid' + ext,
+                       partial(filter_classify_lang_line, lang_code,
+                               langid_min_prob, replacements,
+                               candidates=langid_candidates,
+                               normalize=args.langid_normalize,
+                               cache_size=args.langid_cache)))
 
         # Preprocess 2
         if args.lowercase or args.break_hash or replacements['number']:
-            infile = dest_file
-            outfile = 'tweets.lowercase.' + lang_code + '.json.gz'
-            outfile = os.path.join(tweets_path, outfile)
-            pp2_func = partial(preprocess2, args.lowercase, args.break_hash,
-                               replacements)
-            pp2 = MultiprocessFiles(infile, outfile, pp2_func,
-                                    num_procs=num_jobs, queue_size=qsize)
-            pp2.run()
-
-            os.remove(infile)
+            stages.append(('tweets.lowercase.' + lang_code + ext,
+                           partial(preprocess2, args.lowercase,
+                                   args.break_hash, replacements)))
 
         # Tokenization
-        if args.lowercase or args.break_hash or replacements['number']:
-            source = outfile
-        else:
-            source = dest_file
-        dest = 'tweets.' + lang_code + '.pp.lid.tok.json.gz'
-        dest = os.path.join(tweets_path, dest)
-
-        func = partial(tokenize_tweet, tokenize_function)
-        tokenizer = MultiprocessFiles(source, dest, func, num_procs=num_jobs,
-                                      queue_size=qsize)
-        tokenizer.run()
-
-        os.remove(source)
+        stages.append(('tweets.' + lang_code + '.pp.lid.tok' + ext,
+                       partial(tokenize_tweet, tokenize_function)))
+
+        lang_stages[lang_code] = stages
+
+    # Filter Based on Language: a single scan of tweets_file routes each
+    # tweet to its language, and to a partition of its dedup key
+    route = partial(route_line, set(lang_codes))
+    # Exclude ids: in the same scan, so that an excluded tweet is gone before
+    # the copies and retweets of the tweets kept are dropped
+    if args.exclude_ids:
+        route = partial(exclude_route, idlist, route)
+    num_partitions = num_partitions_for(tweets_file, num_jobs)
+    unique_files = {}
+    for lang_code in lang_codes:
+        unique_files[lang_code] = os.path.join(
+            lang_paths[lang_code], 'tweets.' + lang_code + '.uniq' + ext)
+    split = MultiprocessFiles(tweets_file,
+                              partition_sinks(unique_files, num_partitions),
+                              partial(partition_route, route, num_partitions),
+                              **mp_options)
+    split.run()
+
+    # Filter unique: copies and retweets are dropped before the expensive
+    # stages, each partition by its own process
+    duplicates = dedup_partitions(unique_files, num_partitions, num_jobs,
+                                  args.compress_level)
+    for lang_code in lang_codes:
+        print('%s: %d copies and retweets dropped' % (lang_code,
+                                                       duplicates[lang_code]))
 
-        # Filter unique
-        infile = dest
+    for lang_code in lang_codes:
+        lang_path = lang_paths[lang_code]
+        stages = lang_stages[lang_code]
         outfile = 'tweets.' + lang_code + '.final.json.gz'
-        outfile = os.path.join(tweets_path, outfile)
-
-        tweet_ids = set()
-        make_unique(infile, outfile, tweet_ids)
-
-        os.remove(infile)
+        outfile = os.path.join(lang_path, outfile)
+        # results are appended to the final file, it is kept so it is
+        # compressed like a gzip tool would
+        if os.path.exists(outfile):
+            ldindex.remove(outfile)
+        final_level = get_codec(outfile).default_level
+        last = Sink(outfile, level=final_level)
+        if args.dedup_text:
+            last = os.path.join(lang_path, stages[-1][0])
+
+        source = unique_files[lang_code]
+        if args.stage_files:
+            # one run per stage, each writing its own intermediate file
+            for i, (stage_file, func) in enumerate(stages):
+                dest = os.path.join(lang_path, stage_file)
+                finish_func = None
+                if i == len(stages) - 1:
+                    # tokenization
+                    dest = last
+                    finish_func = tokenize_report
+                stage_run = MultiprocessFiles(
+                    source, dest, func,
+                    batch_func=partial(apply_stages_batch, [func]),
+                    finish_func=finish_func, **mp_options)
+                stage_run.run()
+                ldindex.remove(source)
+                source = stage_run.outfiles[None]
+        else:
+            # all stages applied in a single pass over the unique tweets
+            chain = [func for _, func in stages]
+            fused = MultiprocessFiles(source, last,
+                                      partial(apply_stages, chain),
+                                      batch_func=partial(apply_stages_batch,
+                                                         chain),
+                                      finish_func=tokenize_report,
+                                      **mp_options)
+            fused.run()
+            ldindex.remove(source)
+            source = fused.outfiles[None]
+
+        # Filter unique texts: tweets whose final text is the same as an
+        # earlier one's
+        if args.dedup_text:
+            duplicates = dedup_file(source, outfile, by='text',
+                                    level=final_level, **mp_options)
+            ldindex.remove(source)
+            print('%s: %d duplicate texts dropped' % (lang_code, duplicates))
 
         # Filter emoticons
-        pos_path = os.path.join(tweets_path, 'pos.txt')
-        f_pos = codecs.open(pos_path, 'w', encoding='utf-8')
-
-        neg_path = os.path.join(tweets_path, 'neg.txt')
-        f_neg = codecs.open(neg_path, 'w', encoding='utf-8')
-
-        other_path = os.path.join(tweets_path, 'other.txt')
-        f_other = codecs.open(other_path, 'w', encoding='utf-8')
-
-        # Read and Process
-        with gzip.open(outfile, 'r') as f:
-            for line in f:
-                res = process_line(prob_smiley, line)
-                n += 1
-
-                if res is None:
-                    continue
-                if res[0] is None:
-                    f_other.write(res[1] + u'\n')
-                if res[0] == POS:
-                    n_pos += 1
-                    f_pos.write(res[1] + u'\n')
-                if res[0] == NEG:
-                    f_neg.write(res[1] + u'\n')
-                    n_neg += 1
-
-        # explicitly close files
-        f_pos.close()
-        f_neg.close()
-        f_other.close()
+        label_tweets(outfile, lang_path, prob_smiley, args.seed,
+                     **mp_options)
+
+        # Remove near duplicates, e.g. tweets of bots made from a template
+        if args.near_dup_threshold > 0:
+            for name in ['pos', 'neg', 'other']:
+                path = os.path.join(lang_path, name + '.txt')
+                removed = near_dedup_file(path, args.near_dup_threshold)
+                print('%s: %d near duplicates removed' % (path, removed))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Tests newsfeed_tweets on small archives, run with
+python -m unittest test_newsfeed_tweets
+"""
+
+import os
+import json
+import gzip
+import shutil
+import tempfile
+import unittest
+import cPickle as pickle
+
+from compression import open_file
+from newsfeed_tweets import load_tweets
+
+
+def raw_tweet(tweet_id, text, retweet_id=None):
+    """ Returns a newsfeed record of a tweet """
+    tweet = {'id_str': str(tweet_id), 'text': text, 'lang': 'en',
+             'created_at': 'Thu Jan 01 00:00:00 +0000 2015',
+             'entities': {'hashtags': []}}
+    if retweet_id is not None:
+        tweet['retweeted_status'] = {'id_str': str(retweet_id)}
+    return {'raw_json': json.dumps(tweet)}
+
+
+RECORDS = [pickle.dumps(raw_tweet(1, u'first\ntweet ')),
+           pickle.dumps(raw_tweet(2, u'RT second', retweet_id=1)),
+           pickle.dumps(raw_tweet(3, u'  ')),
+           'not a pickle',
+           pickle.dumps({'raw_json': json.dumps({'text': u'no id',
+                                                 'lang': 'en'})}),
+           pickle.dumps(raw_tweet(4, u'last'))]
+ARCHIVE = ''.join(record + '\x00' for record in RECORDS)
+
+
+class LoadTweetsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def convert(self, name, data, open_function):
+        path = os.path.join(self.directory, name)
+        with open_function(path, 'wb') as destination:
+            destination.write(data)
+        return load_tweets(path, open_function, self.directory, chunk_size=7)
+
+    def output(self):
+        path = os.path.join(self.directory, 'tweets.json.gz')
+        with open_file(path, 'r') as source:
+            return [json.loads(line) for line in source]
+
+    def check_output(self):
+        tweets = self.output()
+        self.assertEqual([tweet['id'] for tweet in tweets], [1, 2, 4])
+        self.assertEqual(tweets[0]['text'], u'first tweet')
+        self.assertNotIn('retweet_id', tweets[0])
+        self.assertEqual(tweets[1]['retweet_id'], 1)
+        self.assertIsInstance(tweets[1]['retweet_id'], int)
+        self.assertEqual(set(tweets[2]), set(['text', 'lang', 'created_at',
+                                              'entities', 'id']))
+
+    def test_gzip(self):
+        self.assertEqual(self.convert('tweets.pickle.gz', ARCHIVE,
+                                      gzip.open), 3)
+        self.check_output()
+
+    def test_plain(self):
+        self.assertEqual(self.convert('tweets.pickle', ARCHIVE, open), 3)
+        self.check_output()
+
+    def test_rerun(self):
+        self.convert('tweets.pickle', ARCHIVE, open)
+        self.convert('tweets.pickle', ARCHIVE, open)
+        self.check_output()
+
+    def test_truncated(self):
+        path = os.path.join(self.directory, 'tweets.pickle.gz')
+        with gzip.open(path, 'wb') as destination:
+            destination.write(ARCHIVE * 100)
+        with open(path, 'rb') as source:
+            data = source.read()
+        with open(path, 'wb') as destination:
+            destination.write(data[:len(data) // 2])
+
+        self.assertIsNone(load_tweets(path, gzip.open, self.directory,
+                                      chunk_size=7))
+        self.assertEqual(os.listdir(self.directory), ['tweets.pickle.gz'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,13 +5,14 @@ Outputs only those with the selected language probability > 'langid_min_prob'.
 """
 
 from __future__ import print_function
-import json
 import argparse
 import sys
 import re
 from functools import partial
 
 from MultiprocessFiles import MultiprocessFiles
+from pipeline import load_tweet
+from lrucache import LRUCache
 import twokenize
 
 re_tok = re.compile(r'(\w+|[^\w\s]+)', re.UNICODE)
@@ -23,6 +24,44 @@ def word_tokenize(text):
     return t.split()
 
 
+class MemoizedTokenizer(object):
+    """Tokenize function that keeps the tokens of the texts it saw most
+    recently. Retweets and spam repeat the same texts many times.
+
+    Each worker process gets its own copy, and cache, when it is forked.
+
+    Attributes:
+        tokenize: function
+            the tokenize function
+        cache: LRUCache
+            tokens of recent texts, it counts hits and misses
+    """
+
+    def __init__(self, tokenize, cache_size):
+        self.tokenize = tokenize
+        self.cache = LRUCache(cache_size)
+
+    def report(self):
+        """Returns the hits and misses of the cache, as a line to print."""
+        return 'tokenize cache: %s' % self.cache.stats()
+
+    def __call__(self, text):
+        tokens = self.cache.get(text)
+        if tokens is None:
+            tokens = tuple(self.tokenize(text))
+            self.cache.put(text, tokens)
+        return list(tokens)
+
+
+def memoize_tokenizer(tokenize, cache_size):
+    """Returns tokenize with a cache of cache_size texts, or tokenize itself
+    if cache_size is 0.
+    """
+    if cache_size > 0:
+        return MemoizedTokenizer(tokenize, cache_size)
+    return tokenize
+
+
 def tokenize_tweet(tokenize, tweet):
     """ Tokenizes tweet with tokenize function.
 
@@ -36,7 +75,7 @@ def tokenize_tweet(tokenize, tweet):
             tweet with tokenized text
     """
     try:
-        tweet = json.loads(tweet)
+        tweet = load_tweet(tweet)
     except:
         return None
 
@@ -66,6 +105,9 @@ def main():
                         help='number of worker processes to use. Default: \
                               number of cores')
     parser.add_argument('-q', '--queue_size', type=int, default=2000)
+    parser.add_argument('-c', '--cache_size', type=int, default=0,
+                        help='number of texts whose tokens each worker \
+                              caches. Default: no cache')
 
     args = parser.parse_args()
 
@@ -87,12 +129,16 @@ def main():
         tokenize_function = twokenize.tokenize2
         print("Tokenize 2")
 
+    tokenize_function = memoize_tokenizer(tokenize_function, args.cache_size)
     func = partial(tokenize_tweet, tokenize_function)
+    # each worker reports its cache when it is done
+    finish_func = getattr(tokenize_function, 'report', None)
 
     for source, dest in zip(tweet_files, dest_files):
         multiprocess = MultiprocessFiles(source, dest, func, 
                                          num_procs=args.num_jobs,
-                                         queue_size=args.queue_size)
+                                         queue_size=args.queue_size,
+                                         finish_func=finish_func)
         multiprocess.run()
 
 
@@ -1,8 +1,9 @@
 import argparse
-import gzip
 import json
 import codecs
 
+from compression import open_file
+
 
 def main():
     """
@@ -10,7 +11,7 @@ def main():
     """
     parser = argparse.ArgumentParser()
     parser.add_argument('neg_file', help='txt file with negative tweets')
-    parser.add_argument('neu_file', help='.json.gz file with neutral tweets')
+    parser.add_argument('neu_file', help='.json(.gz) file with neutral tweets')
     parser.add_argument('pos_file', help='txt file with positive tweets')
     parser.add_argument('output_file')
     args = parser.parse_args()
@@ -22,7 +23,7 @@ def main():
             train_file.write(line.decode(encoding='utf-8').strip() + u'\t' +
                              u'NEGATIVE' + u'\n')
 
-    with gzip.open(args.neu_file, 'r') as source:
+    with open_file(args.neu_file, 'r') as source:
         for line in source:
             try:
                 tweet = json.loads(line)
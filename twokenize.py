@@ -31,31 +31,41 @@ Luis Rei, luis.rei@ijs.si, July 2015
 from __future__ import print_function
 import re
 
+from emoji_tables import EMOJI_SINGLES, EMOJI_PAIRS, EMOJI_PATTERN
+
 
 def regex_or(*items):
     return '(?:' + '|'.join(items) + ')'
 
+class LazyRegex(object):
+    """A regex compiled the first time it is used, so that importing the
+    module stays cheap for processes that never tokenize."""
+
+    def __init__(self, pattern, flags=0):
+        self.pattern = pattern
+        self.flags = flags
+        self._compiled = None
+
+    def __getattr__(self, name):
+        if self._compiled is None:
+            self._compiled = re.compile(self.pattern, self.flags)
+        return getattr(self._compiled, name)
+
+
 # should add the missing ones to this list but i'm lazy
-all_emoji = open('emoji-data.txt').readlines()
-all_emoji = [x.strip() for x in all_emoji if not x.strip().startswith('#')]
-all_emoji = [x.split(';')[0].strip() for x in all_emoji]
-all_emoji_1 = [unichr(int(x, 16)) for x in all_emoji if len(x.split()) == 1]
-all_emoji_2 = [x.split() for x in all_emoji if len(x.split()) == 2]
-all_emoji_2 = [unichr(int(x[0].strip(), 16)) + unichr(int(x[1].strip(), 16))
-               for x in all_emoji_2]
-all_emoji = all_emoji_1 + all_emoji_2
-all_emoji = [re.escape(x) for x in all_emoji]
-all_emoji_str = u'(' + ur'|'.join(all_emoji) + u')'
-re_emoji = re.compile(all_emoji_str, re.UNICODE)
-
-Contractions = re.compile(u"(?i)(\w+)(n['’′]t|['’′]ve|['’′]ll|['’′]d|['’′]re|['’′]s|['’′]m)$", re.UNICODE)
-Whitespace = re.compile(u"[\s\u0020\u00a0\u1680\u180e\u202f\u205f\u3000\u2000-\u200a]+", re.UNICODE)
+# (tables generated from emoji-data.txt by gen_emoji_tables.py)
+all_emoji_1 = [unichr(x) for x in EMOJI_SINGLES]
+all_emoji_2 = [unichr(x) + unichr(y) for x, y in EMOJI_PAIRS]
+re_emoji = LazyRegex(EMOJI_PATTERN, re.UNICODE)
+
+Contractions = LazyRegex(u"(?i)(\w+)(n['’′]t|['’′]ve|['’′]ll|['’′]d|['’′]re|['’′]s|['’′]m)$", re.UNICODE)
+Whitespace = LazyRegex(u"[\s\u0020\u00a0\u1680\u180e\u202f\u205f\u3000\u2000-\u200a]+", re.UNICODE)
 
 punctSeq   = r"['\"“”‘’]+|[.?!,…]+|[:;]+"	#'anthem'. => ' anthem ' .
 entity     = r"&(?:amp|lt|gt|quot);"
 
 # don't it's a trap l'app - words separated by apostrophe
-ApWords = re.compile(ur"(\w+)('|\u2019)(\w+)", re.UNICODE)
+ApWords = LazyRegex(ur"(\w+)('|\u2019)(\w+)", re.UNICODE)
 
 # Abbreviations
 boundaryNotDot = regex_or("$", r"\s", r"[“\"?!,:;]", entity)
@@ -145,7 +155,7 @@ Email = regex_or("(?<=(?:\W))", "(?<=(?:^))") + r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-
 
 # We will be tokenizing using these regexps as delimiters
 # Additionally, these things are "protected", meaning they shouldn't be further split themselves.
-Protected  = re.compile(
+Protected  = LazyRegex(
     unicode(regex_or(
         Hearts,
         Email,
@@ -173,8 +183,8 @@ edgePunctChars    = u"'\"“”‘’«»{}\\(\\)\\[\\]\\*&" #add \\p{So}? (symb
 edgePunct    = "[" + edgePunctChars + "]"
 notEdgePunct = "[a-zA-Z0-9]" # content characters
 offEdge = r"(^|$|:|;|\s|\.|,)"  # colon here gets "(hello):" ==> "( hello ):"
-EdgePunctLeft  = re.compile(offEdge + "("+edgePunct+"+)("+notEdgePunct+")", re.UNICODE)
-EdgePunctRight = re.compile("("+notEdgePunct+")("+edgePunct+"+)" + offEdge, re.UNICODE)
+EdgePunctLeft  = LazyRegex(offEdge + "("+edgePunct+"+)("+notEdgePunct+")", re.UNICODE)
+EdgePunctRight = LazyRegex("("+notEdgePunct+")("+edgePunct+"+)" + offEdge, re.UNICODE)
 
 
 def splitEdgePunct(input):